@@ -1,17 +1,93 @@
 import shlex
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from git import GitUtils, GitData
-from display import display_author_stats, display_top_contributors, display_repo_info
-from display import Prompts
+from git import GitUtils, GitData, GitResults, LoadCancelled, LoadProgress, WalkFilter
+from display import display_top_contributors, display_repo_info
+from display import Prompts, display_author_query, display_path_query, display_profile
+from display import display_branch_summary
+from series import BUCKET_PERIODS, parse_date
+from blame import BlameEngine
+from branches import BranchAnalysis
+from session import GitSession
+from profiling import profiler
 from colorama import Fore
-from typing import Optional
+from typing import List, Optional
+
+
+def choice_of(choices):
+    def convert(value: str) -> str:
+        if value not in choices:
+            raise ValueError(value)
+        return value
+    return convert
+
+
+def count_at_least(minimum: int):
+    def convert(value: str) -> int:
+        if not value.isdigit() or int(value) < minimum:
+            raise ValueError(value)
+        return int(value)
+    return convert
+
+
+def limit_count(value: str) -> Optional[int]:
+    return None if value == 'all' else count_at_least(1)(value)
+
+
+def pathspec_list(value: str) -> List[str]:
+    pathspecs = [pathspec for pathspec in value.split(',') if pathspec]
+    if not pathspecs:
+        raise ValueError(value)
+    return pathspecs
+
 
 class App:
+    TOP_FLAGS = {
+        '-by': choice_of(GitResults.RANK_METRICS),
+        '--offset': count_at_least(0),
+        '--limit': limit_count,
+        '--since': parse_date,
+        '--until': parse_date,
+        '--path': str,
+    }
+    OWNERS_FLAGS = {
+        '--offset': count_at_least(0),
+        '--limit': limit_count,
+    }
+    SETPATH_FLAGS = {
+        '-j': count_at_least(1),
+        '--path-depth': count_at_least(0),
+        '--path-nodes': count_at_least(1),
+    }
+    FILTER_FLAGS = {
+        '--since': parse_date,
+        '--until': parse_date,
+        '--author': str,
+        '--merges': choice_of(('yes', 'no')),
+        '--include': pathspec_list,
+        '--exclude': pathspec_list,
+    }
+    AUTHOR_FLAGS = {
+        '--since': parse_date,
+        '--until': parse_date,
+        '--bucket': choice_of(BUCKET_PERIODS),
+    }
+
     def __init__(self):
         self.repo_path: Optional[Path] = None
         self.git_data: Optional[GitData] = None
+        self.loader: Optional[threading.Thread] = None
+        self.progress: Optional[LoadProgress] = None
+        self.load_flags: dict = {}
+        self.walk_filter: Optional[WalkFilter] = None
+        self.load_error: Optional[str] = None
+        self.load_announced = True
 
     def start(self):
+        # Interactive commands are not timing sensitive, so the shell keeps
+        # statistics for 'stats' from the start.
+        profiler.enable()
         Prompts.info_prompt(
             "<< Welcome to GitTracker >>"
         )
@@ -20,6 +96,7 @@ class App:
         )
         while True:
             try:
+                self.announce_load()
                 user_input = input(f"{Fore.BLUE}>>> {Fore.RESET}").strip()
                 if not user_input:
                     continue
@@ -31,6 +108,7 @@ class App:
 
                 match command:
                     case 'exit' | 'quit':
+                        self.close()
                         Prompts.info_prompt(
                             "Exiting interactive shell. Goodbye!")
                         break
@@ -42,12 +120,27 @@ class App:
                         self.handle_author(args)
                     case 'top':
                         self.handle_top(args)
+                    case 'find':
+                        self.handle_find(args)
+                    case 'owners':
+                        self.handle_owners(args)
+                    case 'branches':
+                        self.handle_branches(args)
+                    case 'filter':
+                        self.handle_filter(args)
                     case 'info':
                         self.handle_info()
+                    case 'status':
+                        self.handle_status()
+                    case 'wait':
+                        self.handle_wait()
+                    case 'stats':
+                        self.handle_stats(args)
                     case _:
                         Prompts.error_prompt(f"Unknown command: {command}. Type 'help' to see available commands.")
             except KeyboardInterrupt:
                 print()
+                self.close()
                 Prompts.info_prompt("Exiting interactive shell. Goodbye!")
                 break
             except Exception as e:
@@ -57,22 +150,73 @@ class App:
         help_text = f"""
 {Prompts.color_text(Fore.CYAN, 'Available Commands:')}
 
-- {Prompts.color_text(Fore.YELLOW, 'setpath <path>')}
-    Set the path to the Git repository.
+- {Prompts.color_text(Fore.YELLOW, 'setpath <path> [-j N] [--path-depth N] [--path-nodes N]')}
+    Set the path to the Git repository. The history is loaded in the
+    background; commands answer from the commits read so far until the
+    load finishes.
+    Optional flag:
+        -j N             Walk the history with N worker processes
+        --path-depth N   Keep directory statistics at most N levels deep
+        --path-nodes N   Keep directory statistics for at most N directories
 
-- {Prompts.color_text(Fore.YELLOW, 'author "<author_name>"')}
-    Display statistics for a specific author.
+- {Prompts.color_text(Fore.YELLOW, 'author "<author_name>" [--since DATE] [--until DATE] [--bucket week|month]')}
+    Display statistics for a specific author, matched by name or email
+    regardless of case.
+    Optional flags:
+        --since DATE    Only count commits on or after DATE
+        --until DATE    Only count commits before DATE
+        --bucket week   Break the contributions down by week (or month)
 
-- {Prompts.color_text(Fore.YELLOW, 'top [-by i|d|net]')}
-    Display top 10 contributors.
-    Optional flag:
-        -by i    Rank by Insertions
-        -by d    Rank by Deletions
-        -by net  Rank by Net Contribution (default)
+- {Prompts.color_text(Fore.YELLOW, 'top [-by i|d|net|c|o|m] [--offset N] [--limit N|all] [--since DATE] [--until DATE] [--path DIR]')}
+    Display the top contributors.
+    Optional flags:
+        -by i       Rank by Insertions
+        -by d       Rank by Deletions
+        -by net     Rank by Net Contribution (default)
+        -by c       Rank by Commits
+        -by o       Rank by Lines Owned in the current tree (runs git blame)
+        -by m       Rank by Distinct Commits times Median Commit Size, which
+                    a few huge commits cannot inflate
+        --offset N  Skip the first N ranked contributors (default: 0)
+        --limit N   Show N contributors, or all of them (default: 10)
+        --since DATE, --until DATE
+                    Only count commits in this window. DATE is YYYY-MM-DD
+                    or an age such as 90d, 12w, 6m or 1y.
+        --path DIR  Only count changes under the directory DIR
+
+- {Prompts.color_text(Fore.YELLOW, 'find <text>')}
+    List authors whose name or email starts with or contains the text.
+
+- {Prompts.color_text(Fore.YELLOW, 'owners <dir> [--offset N] [--limit N|all]')}
+    Display who added the most lines under a directory.
+
+- {Prompts.color_text(Fore.YELLOW, 'branches [ref ...]')}
+    Compare branches (default: every local and remote branch) in one walk:
+    commits per branch, the top contributors over all of them with shared
+    commits counted once, and each branch's contributors on the commits
+    only it reaches. Uses the -j given to setpath and the dates of the
+    walk filter; author, merge and path filters are not supported.
+
+- {Prompts.color_text(Fore.YELLOW, 'filter [--since DATE] [--until DATE] [--author TEXT] [--merges yes|no] [--include PATHS] [--exclude PATHS]')}
+    Reload the repository counting only what passes the filter; git skips
+    the rest while it walks. --author keeps the commits whose author name
+    or email contains TEXT. PATHS is a comma-separated list of pathspecs,
+    such as vendor,dist or '*.lock'. 'filter' alone shows the current
+    filter and 'filter clear' removes it.
 
 - {Prompts.color_text(Fore.YELLOW, 'info')}
     Display repository information.
 
+- {Prompts.color_text(Fore.YELLOW, 'status')}
+    Show how far the repository load has got.
+
+- {Prompts.color_text(Fore.YELLOW, 'wait')}
+    Block until the repository load finishes (Ctrl-C stops waiting).
+
+- {Prompts.color_text(Fore.YELLOW, 'stats [reset]')}
+    Show time spent per phase and per git command, and peak memory use,
+    since the shell started (or since the last 'stats reset').
+
 - {Prompts.color_text(Fore.YELLOW, 'help')}
     Show this help message.
 
@@ -90,10 +234,143 @@ class App:
             Prompts.error_prompt(
                 f"The path '{path}' does not exist or is not a directory.")
             return
+        usage = "Use 'setpath <path> [-j N] [--path-depth N] [--path-nodes N]'."
+        flags = self.parse_flags(args[1:], self.SETPATH_FLAGS, usage)
+        if flags is None:
+            return
         GitUtils.validate_git(path)
+        self.load_flags = flags
+        self.start_load(path)
+        Prompts.success_prompt(
+            f"Git repository set to: {path} (loading in the background)")
+
+    def start_load(self, path: Path):
+        self.cancel_load()
+        if self.repo_path is not None and self.repo_path != path:
+            GitSession.release(self.repo_path)
         self.repo_path = path
-        self.git_data = GitData(path)
-        Prompts.success_prompt(f"Git repository set to: {path}")
+        self.progress = LoadProgress()
+        flags = self.load_flags
+        self.git_data = GitData(
+            path, jobs=flags.get('-j', 1), progress=self.progress, autoload=False,
+            path_depth=flags.get('--path-depth'), path_nodes=flags.get('--path-nodes'),
+            walk_filter=self.walk_filter)
+        self.load_error = None
+        self.load_announced = False
+        self.loader = threading.Thread(
+            target=self.run_load, args=(self.git_data,), daemon=True)
+        self.loader.start()
+
+    def handle_filter(self, args):
+        if not args:
+            description = self.walk_filter.describe() if self.walk_filter else 'none'
+            Prompts.info_prompt(f"Walk filter: {description}")
+            return
+        if args == ['clear']:
+            walk_filter = None
+        else:
+            usage = ("Use 'filter [--since DATE] [--until DATE] [--author TEXT] "
+                     "[--merges yes|no] [--include PATHS] [--exclude PATHS]' "
+                     "or 'filter clear'.")
+            flags = self.parse_flags(args, self.FILTER_FLAGS, usage)
+            if flags is None:
+                return
+            walk_filter = WalkFilter(
+                flags.get('--since'), flags.get('--until'), flags.get('--author'),
+                no_merges=flags.get('--merges') == 'no',
+                include=flags.get('--include', ()), exclude=flags.get('--exclude', ()))
+        self.walk_filter = walk_filter or None
+        description = self.walk_filter.describe() if self.walk_filter else 'none'
+        if self.repo_path is None:
+            Prompts.success_prompt(f"Walk filter set: {description}")
+            return
+        self.start_load(self.repo_path)
+        Prompts.success_prompt(
+            f"Walk filter set: {description} (reloading {self.repo_path} in the background)")
+
+    def run_load(self, git_data: GitData):
+        try:
+            git_data.fetch_all_data()
+        except LoadCancelled:
+            return
+        except SystemExit:
+            # GitUtils reports git failures itself before exiting.
+            self.load_error = "git could not read the repository"
+        except Exception as e:
+            self.load_error = str(e)
+
+    def is_loading(self) -> bool:
+        return self.loader is not None and self.loader.is_alive()
+
+    def cancel_load(self):
+        if self.is_loading():
+            self.progress.cancel()
+            self.loader.join()
+        self.loader = None
+
+    def close(self):
+        self.cancel_load()
+        if self.repo_path is not None:
+            GitSession.release(self.repo_path)
+
+    def announce_load(self):
+        """
+        Reports a load that finished since the last prompt.
+        """
+        if self.load_announced or self.is_loading() or self.loader is None:
+            return
+        self.load_announced = True
+        if self.load_error is not None:
+            Prompts.error_prompt(f"Loading {self.repo_path} failed: {self.load_error}")
+            self.repo_path = None
+            self.git_data = None
+            return
+        Prompts.success_prompt(
+            f"Finished loading {self.repo_path}: "
+            f"{len(self.git_data.git_results.series)} commits.")
+
+    def describe_progress(self) -> str:
+        return (f"{self.progress.commits} commits read "
+                f"({self.progress.rate():.0f} commits/s)")
+
+    @contextmanager
+    def reading(self):
+        """
+        Holds the loader off the results while a command reads them, and
+        flags the answer as partial when the load is still running.
+        """
+        if not self.is_loading():
+            yield
+            return
+        with self.progress.lock:
+            self.git_data.refresh_summary()
+            Prompts.color_print(
+                f"Still loading; partial results from {self.describe_progress()}.",
+                Fore.YELLOW)
+            yield
+
+    def handle_status(self):
+        if not self.repo_path or not self.git_data:
+            Prompts.error_prompt(
+                "Repository path not set. Use 'setpath <path>' first.")
+            return
+        if self.is_loading():
+            Prompts.info_prompt(f"Loading {self.repo_path}: {self.describe_progress()}.")
+        else:
+            Prompts.info_prompt(f"{self.repo_path} is fully loaded.")
+
+    def handle_wait(self):
+        if not self.is_loading():
+            Prompts.info_prompt("No repository load is running.")
+            return
+        try:
+            while self.is_loading():
+                self.loader.join(timeout=1)
+                if self.is_loading():
+                    Prompts.color_print(f"  {self.describe_progress()}", Fore.CYAN)
+        except KeyboardInterrupt:
+            print()
+            Prompts.info_prompt("Stopped waiting; the load continues in the background.")
 
     def handle_author(self, args):
         if not self.repo_path or not self.git_data:
@@ -104,16 +381,14 @@ class App:
             Prompts.error_prompt("'author' command requires an author name.")
             return
         author = args[0]
-        author_result = self.git_data.git_results.get_contribution(author)
-        if not author_result:
-            try:
-                GitUtils.check_author_exists(self.repo_path, author)
-                self.git_data = GitData(self.repo_path)
-                author_result = self.git_data.git_results.get_contribution(
-                    author)
-            except SystemExit:
-                return
-        display_author_stats(author_result)
+        usage = "Use 'author \"<author_name>\" [--since DATE] [--until DATE] [--bucket week|month]'."
+        flags = self.parse_flags(args[1:], self.AUTHOR_FLAGS, usage)
+        if flags is None:
+            return
+        with self.reading():
+            display_author_query(
+                self.git_data.git_results, author, flags.get('--since'),
+                flags.get('--until'), flags.get('--bucket'))
 
     def handle_top(self, args):
         if not self.repo_path or not self.git_data:
@@ -121,26 +396,143 @@ class App:
                 "Repository path not set. Use 'setpath <path>' first."
             )
             return
-        by = 'net'
-        if args:
-            if len(args) >= 2 and args[0] == '-by':
-                if args[1] in ['i', 'd', 'net']:
-                    by = args[1]
-                else:
-                    Prompts.error_prompt(
-                        "Invalid flag for 'top' command. Use -by i|d|net.")
-                    return
-            else:
+        usage = ("Use 'top [-by i|d|net|c|o|m] [--offset N] [--limit N|all] "
+                 "[--since DATE] [--until DATE] [--path DIR]'.")
+        flags = self.parse_flags(args, self.TOP_FLAGS, usage)
+        if flags is None:
+            return
+        by = flags.get('-by', 'net')
+        since, until = flags.get('--since'), flags.get('--until')
+        if by == 'o' and (since is not None or until is not None or '--path' in flags):
+            Prompts.error_prompt(
+                "'-by o' ranks lines owned in the current tree and cannot be "
+                "combined with '--since', '--until' or '--path'.")
+            return
+        if '--path' in flags:
+            if since is not None or until is not None:
+                Prompts.error_prompt(
+                    "'--path' cannot be combined with '--since' or '--until'.")
+                return
+            if by == 'm':
                 Prompts.error_prompt(
-                    "Invalid arguments for 'top' command. Use 'top -by i|d|net'.")
+                    "'-by m' needs per-commit sizes, which directory statistics do not keep.")
                 return
-        top_contributors = self.git_data.git_results.get_top_contributors(
-            by=by)
-        display_top_contributors(top_contributors, by)
+            with self.reading():
+                display_path_query(
+                    self.git_data.git_results, flags['--path'], flags.get('--limit', 10),
+                    flags.get('--offset', 0), by)
+            return
+        with self.reading():
+            git_results = self.git_data.git_results
+            if by == 'o' and not git_results.has_ownership():
+                BlameEngine(self.repo_path).apply(git_results)
+            if since is not None or until is not None:
+                git_results = git_results.window(since, until)
+            with profiler.phase('rank'):
+                top_contributors = git_results.get_top_contributors(
+                    by=by, top_n=flags.get('--limit', 10), offset=flags.get('--offset', 0))
+            with profiler.phase('render'):
+                display_top_contributors(top_contributors, by)
+
+    @staticmethod
+    def parse_flags(args, allowed: dict, usage: str) -> Optional[dict]:
+        """
+        Parses `-flag value` pairs, converting each value with the function
+        registered for its flag. Returns None after reporting an error.
+        """
+        if len(args) % 2:
+            Prompts.error_prompt(f"Invalid arguments. {usage}")
+            return None
+        flags = {}
+        for flag, value in zip(args[::2], args[1::2]):
+            if flag not in allowed:
+                Prompts.error_prompt(f"Unknown flag '{flag}'. {usage}")
+                return None
+            try:
+                flags[flag] = allowed[flag](value)
+            except ValueError:
+                Prompts.error_prompt(f"Invalid value '{value}' for '{flag}'. {usage}")
+                return None
+        return flags
+
+    def handle_find(self, args):
+        if not self.repo_path or not self.git_data:
+            Prompts.error_prompt(
+                "Repository path not set. Use 'setpath <path>' first.")
+            return
+        if not args:
+            Prompts.error_prompt("'find' command requires some text to search for.")
+            return
+        with self.reading():
+            git_results = self.git_data.git_results
+            author_ids = git_results.author_index().search(args[0], limit=25)
+            names = [git_results.author_names[author_id] for author_id in author_ids]
+        if not names:
+            Prompts.color_print("No matching authors.", Fore.YELLOW)
+            return
+        for name in names:
+            Prompts.color_print(name, Fore.RESET)
+
+    def handle_owners(self, args):
+        if not self.repo_path or not self.git_data:
+            Prompts.error_prompt(
+                "Repository path not set. Use 'setpath <path>' first.")
+            return
+        if not args:
+            Prompts.error_prompt("'owners' command requires a directory.")
+            return
+        usage = "Use 'owners <dir> [--offset N] [--limit N|all]'."
+        flags = self.parse_flags(args[1:], self.OWNERS_FLAGS, usage)
+        if flags is None:
+            return
+        with self.reading():
+            display_path_query(self.git_data.git_results, args[0],
+                               flags.get('--limit', 10), flags.get('--offset', 0))
+
+    def handle_branches(self, args):
+        if not self.repo_path:
+            Prompts.error_prompt(
+                "Repository path not set. Use 'setpath <path>' first.")
+            return
+        walk_filter = self.walk_filter
+        if walk_filter and (walk_filter.author or walk_filter.no_merges or
+                            walk_filter.include or walk_filter.exclude):
+            Prompts.error_prompt(
+                "'branches' only honours the dates of a walk filter; use 'filter clear' "
+                "or a filter with just --since/--until.")
+            return
+        try:
+            analysis = BranchAnalysis(self.repo_path, args, self.load_flags.get('-j', 1)).run()
+        except SystemExit:
+            # The bad ref or git failure has already been reported.
+            return
+
+        def scoped(git_results: GitResults) -> GitResults:
+            if not walk_filter:
+                return git_results
+            return git_results.window(walk_filter.since, walk_filter.until)
+
+        display_branch_summary(analysis.summary())
+        Prompts.info_prompt("All Branches (shared commits counted once):")
+        display_top_contributors(scoped(analysis.combined()).get_top_contributors(), 'net')
+        for ref in analysis.refs:
+            Prompts.info_prompt(f"Only on {ref}:")
+            display_top_contributors(
+                scoped(analysis.unique_results(ref)).get_top_contributors(), 'net')
+
+    def handle_stats(self, args):
+        if args == ['reset']:
+            profiler.reset()
+            Prompts.success_prompt("Statistics reset.")
+        elif args:
+            Prompts.error_prompt("Invalid arguments. Use 'stats [reset]'.")
+        else:
+            display_profile(profiler.summary())
 
     def handle_info(self):
         if not self.repo_path or not self.git_data:
             Prompts.error_prompt(
                 "Repository path not set. Use 'setpath <path>' first.")
             return
-        display_repo_info(self.git_data)
+        with self.reading():
+            display_repo_info(self.git_data)
@@ -0,0 +1,69 @@
+# author_index.py
+
+import difflib
+from bisect import bisect_left
+from typing import Dict, List, Set
+
+
+class AuthorIndex:
+    """
+    In-memory lookup of author ids by name or email. Every key is stored
+    case-folded, so lookups, prefix matches, substring matches and "did you
+    mean" suggestions are answered without running git.
+    """
+
+    def __init__(self, author_names: List[str], emails: Dict[str, List[int]]):
+        self.author_names = author_names
+        self._keys: Dict[str, Set[int]] = {}
+        for author_id, author in enumerate(author_names):
+            self._keys.setdefault(author.casefold(), set()).add(author_id)
+        for email, author_ids in emails.items():
+            self._keys.setdefault(email.casefold(), set()).update(author_ids)
+        self._sorted_keys = sorted(self._keys)
+
+    def lookup(self, query: str) -> List[int]:
+        """
+        Author ids whose name or email equals the query, ignoring case.
+        """
+        return sorted(self._keys.get(query.casefold(), ()))
+
+    def search(self, query: str, limit: int = 10) -> List[int]:
+        """
+        Author ids with a name or email that starts with the query, followed
+        by those that merely contain it.
+        """
+        folded = query.casefold()
+        matches: List[int] = []
+        seen: Set[int] = set()
+
+        def collect(key: str):
+            for author_id in sorted(self._keys[key]):
+                if author_id not in seen:
+                    seen.add(author_id)
+                    matches.append(author_id)
+
+        start = bisect_left(self._sorted_keys, folded)
+        for key in self._sorted_keys[start:]:
+            if not key.startswith(folded) or len(matches) >= limit:
+                break
+            collect(key)
+        for key in self._sorted_keys:
+            if len(matches) >= limit:
+                break
+            if folded in key:
+                collect(key)
+        return matches[:limit]
+
+    def suggest(self, query: str, limit: int = 5) -> List[str]:
+        """
+        Names to offer as "did you mean" for a query that matched nothing.
+        """
+        names = [self.author_names[author_id] for author_id in self.search(query, limit)]
+        if len(names) < limit:
+            for key in difflib.get_close_matches(query.casefold(), self._sorted_keys,
+                                                 n=limit, cutoff=0.6):
+                for author_id in sorted(self._keys[key]):
+                    name = self.author_names[author_id]
+                    if name not in names:
+                        names.append(name)
+        return names[:limit]
@@ -0,0 +1,131 @@
+# batch.py
+
+import asyncio
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from git import CachedWalk, GitResults, GitUtils, NumstatParser, WalkFilter
+from session import GitSession
+
+
+def discover_repositories(paths: List[Path]) -> List[Path]:
+    """
+    Expands each path into the repositories it names: the path itself when it
+    is a work tree, otherwise the work trees directly beneath it.
+    """
+    repositories: List[Path] = []
+    for path in paths:
+        if GitUtils.is_work_tree(path):
+            repositories.append(path)
+            continue
+        if path.is_dir():
+            repositories.extend(
+                child for child in sorted(path.iterdir())
+                if child.is_dir() and GitUtils.is_work_tree(child)
+            )
+    return repositories
+
+
+def _walk_repository(repo_path: Path, use_cache: bool,
+                     walk_filter: Optional[WalkFilter]) -> Tuple[Optional[dict], Optional[str]]:
+    # Runs in a worker process, so the parsing of each repository gets a
+    # core of its own; results travel back as a plain dict of columns, as
+    # they do from the shards of a parallel walk.
+    try:
+        try:
+            walk = CachedWalk(repo_path, use_cache, track_paths=False)
+        except (SystemExit, OSError):
+            return None, "not a readable git repository"
+        if walk.revision is not None:
+            error = _stream_log(repo_path, walk.revision, walk.git_results, walk_filter)
+            if error is not None:
+                return None, error
+            walk.save()
+        return walk.git_results.to_dict(), None
+    finally:
+        # Resolving HEAD opened a cat-file session; a worker that walks
+        # hundreds of repositories must not keep one for each.
+        GitSession.release(repo_path)
+
+
+def _stream_log(repo_path: Path, revision: str, git_results: GitResults,
+                walk_filter: Optional[WalkFilter]) -> Optional[str]:
+    cmd = GitUtils.build_log_command(revision=revision, walk_filter=walk_filter)
+    try:
+        process = subprocess.Popen(
+            cmd,
+            cwd=str(repo_path),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+    except FileNotFoundError:
+        return "Git is not installed or not found in PATH."
+
+    if walk_filter:
+        parser = NumstatParser(git_results, walk_filter.since, walk_filter.until)
+    else:
+        parser = NumstatParser(git_results)
+    with process:
+        while True:
+            chunk = process.stdout.read1(GitUtils.CHUNK_SIZE)
+            if not chunk:
+                break
+            parser.feed(chunk)
+        parser.close()
+        stderr = process.stderr.read()
+        if process.wait() != 0:
+            return f"Git error: {stderr.decode('utf-8', errors='replace').strip()}"
+    return None
+
+
+class BatchRunner:
+    """
+    Walks the history of many repositories at once. asyncio schedules the
+    repositories onto a pool of `concurrency` worker processes, each of
+    which runs one repository's git log and parses its output, so both git
+    and the parsing keep every core busy.
+    """
+
+    def __init__(self, repo_paths: List[Path], concurrency: int = 4,
+                 use_cache: bool = True, walk_filter: Optional[WalkFilter] = None):
+        self.repo_paths = repo_paths
+        self.concurrency = concurrency
+        # Filtered walks cover only part of the history, so they bypass
+        # the cache like GitData's do.
+        self.use_cache = use_cache and not walk_filter
+        self.walk_filter = walk_filter
+        self.results: Dict[Path, GitResults] = {}
+        self.failures: Dict[Path, str] = {}
+
+    def run(self) -> Dict[Path, GitResults]:
+        asyncio.run(self._run_all())
+        return self.results
+
+    def leaderboard(self) -> GitResults:
+        combined = GitResults()
+        for git_results in self.results.values():
+            combined.merge(git_results)
+        return combined
+
+    async def _run_all(self):
+        workers = min(self.concurrency, len(self.repo_paths))
+        if workers:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                await asyncio.gather(*(
+                    self._analyze(repo_path, executor) for repo_path in self.repo_paths
+                ))
+        # Keep the report in the order the repositories were given.
+        self.results = {
+            repo_path: self.results[repo_path]
+            for repo_path in self.repo_paths if repo_path in self.results
+        }
+
+    async def _analyze(self, repo_path: Path, executor: ProcessPoolExecutor):
+        data, error = await asyncio.get_running_loop().run_in_executor(
+            executor, _walk_repository, repo_path, self.use_cache, self.walk_filter)
+        if error is not None:
+            self.failures[repo_path] = error
+            return
+        self.results[repo_path] = GitResults.from_dict(data)
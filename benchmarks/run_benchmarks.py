@@ -0,0 +1,167 @@
+# run_benchmarks.py
+"""
+Times each stage of an analysis against a synthetic repository and saves
+the results as JSON. With --compare, the run is checked against a stored
+baseline and the script exits with status 1 when a stage got slower than
+the threshold allows.
+
+    python benchmarks/run_benchmarks.py --commits 5000 --output base.json
+    python benchmarks/run_benchmarks.py --commits 5000 --compare base.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from synthetic_repo import add_spec_arguments, build_repo, spec_from_args  # noqa: E402
+from display import display_top_contributors  # noqa: E402
+from git import GitResults, GitUtils, NumstatParser  # noqa: E402
+from session import GitSession  # noqa: E402
+
+
+def time_stage(run: Callable[[], object], repeat: int) -> Dict[str, object]:
+    runs: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        runs.append(time.perf_counter() - started)
+    return {'min': min(runs), 'median': statistics.median(runs), 'runs': runs}
+
+
+def run_stages(repo_path: Path, repeat: int) -> Dict[str, Dict[str, object]]:
+    raw = b''.join(GitUtils.stream_git_data(repo_path))
+    parsed = GitResults()
+    GitUtils.resolve_git_output(raw, parsed)
+
+    def walk():
+        for _ in GitUtils.stream_git_data(repo_path):
+            pass
+
+    def parse():
+        parser = NumstatParser(GitResults())
+        for start in range(0, len(raw), GitUtils.CHUNK_SIZE):
+            parser.feed(raw[start:start + GitUtils.CHUNK_SIZE])
+        parser.close()
+
+    def aggregate():
+        GitResults().merge(parsed)
+        parsed.window(parsed.first_commit_time, None)
+        parsed.path_results('')
+
+    # Every ranking run gets its own copy, built outside the timed stage,
+    # so the ranking caches start cold.
+    data = parsed.to_dict()
+    copies = iter([GitResults.from_dict(data) for _ in range(repeat)])
+
+    def rank():
+        fresh = next(copies)
+        for by in ('i', 'd', 'net', 'c'):
+            fresh.get_top_contributors(by=by, top_n=10)
+            fresh.get_top_contributors(by=by, top_n=len(fresh))
+
+    top = parsed.get_top_contributors(by='net', top_n=len(parsed))
+
+    def render():
+        with contextlib.redirect_stdout(io.StringIO()):
+            display_top_contributors(top, 'net')
+
+    def metadata():
+        GitSession.release(repo_path)
+        GitUtils.get_head_commit(repo_path)
+        GitUtils.get_branches(repo_path)
+        GitUtils.get_predominant_language(repo_path, use_cache=False)
+
+    stages = {
+        'git_walk': walk,
+        'parse': parse,
+        'aggregate': aggregate,
+        'rank': rank,
+        'render': render,
+        'metadata': metadata,
+    }
+    return {name: time_stage(run, repeat) for name, run in stages.items()}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """
+    Stages whose best time is more than `threshold` slower than the
+    baseline's, described one per line.
+    """
+    regressions = []
+    for stage, timing in results['stages'].items():
+        base = baseline['stages'].get(stage)
+        if base is None or base['min'] <= 0:
+            continue
+        ratio = timing['min'] / base['min']
+        line = (f"{stage:<10} {base['min'] * 1000:10.2f} ms -> "
+                f"{timing['min'] * 1000:10.2f} ms  ({ratio:.2f}x)")
+        print(line)
+        if ratio > 1 + threshold:
+            regressions.append(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark git-measure on a synthetic repository.')
+    add_spec_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Runs per stage; the best and median are reported (default: 5)')
+    parser.add_argument('--workdir', type=Path,
+                        default=Path(tempfile.gettempdir()) / 'git-measure-bench',
+                        help='Where generated repositories are kept between runs')
+    parser.add_argument('--output', type=Path, help='Write the results to this JSON file')
+    parser.add_argument('--compare', type=Path, metavar='BASELINE',
+                        help='Report each stage against a stored results file')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Slowdown tolerated by --compare before it fails (default: 0.10)')
+    args = parser.parse_args()
+
+    spec = spec_from_args(args)
+    try:
+        repo_path = build_repo(args.workdir / spec.slug(), spec)
+    except (OSError, subprocess.CalledProcessError) as e:
+        sys.stderr.write(f"Could not build the repository: {e}\n")
+        sys.exit(1)
+
+    git_version = subprocess.run(['git', '--version'], stdout=subprocess.PIPE,
+                                 text=True).stdout.strip()
+    results = {
+        'spec': spec.to_dict(),
+        'python': platform.python_version(),
+        'git': git_version,
+        'repeat': args.repeat,
+        'stages': run_stages(repo_path, args.repeat),
+    }
+
+    for stage, timing in results['stages'].items():
+        print(f"{stage:<10} min {timing['min'] * 1000:10.2f} ms   "
+              f"median {timing['median'] * 1000:10.2f} ms")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        if baseline.get('spec') != results['spec']:
+            print("Warning: the baseline was recorded with different repository settings.")
+        print(f"\nCompared with {args.compare}:")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) slower than the "
+                  f"{args.threshold:.0%} threshold.")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+# synthetic_repo.py
+"""
+Builds deterministic synthetic repositories for the benchmarks by feeding
+a generated stream to `git fast-import`, so no network access or checkout
+is needed. The same settings and seed always give the same history.
+
+    python benchmarks/synthetic_repo.py /tmp/bench-repo --commits 5000
+"""
+
+import argparse
+import random
+import subprocess
+import sys
+from pathlib import Path
+from typing import IO, List
+
+EXTENSIONS = ('.py', '.js', '.go', '.c', '.java', '.ts', '.md', '.json')
+START_TIME = 1_600_000_000
+COMMIT_INTERVAL = 3600
+
+
+class RepoSpec:
+    def __init__(self, commits: int = 2000, authors: int = 20, files_per_commit: int = 5,
+                 binary_share: float = 0.05, file_pool: int = 500, seed: int = 1):
+        self.commits = commits
+        self.authors = authors
+        self.files_per_commit = files_per_commit
+        self.binary_share = binary_share
+        self.file_pool = file_pool
+        self.seed = seed
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+    def slug(self) -> str:
+        return (f"c{self.commits}-a{self.authors}-f{self.files_per_commit}"
+                f"-b{self.binary_share:g}-p{self.file_pool}-s{self.seed}")
+
+
+def _paths(spec: RepoSpec, rng: random.Random) -> List[str]:
+    paths = []
+    for index in range(spec.file_pool):
+        depth = rng.randint(1, 4)
+        directories = '/'.join(f"dir{rng.randint(0, 7)}" for _ in range(depth))
+        if rng.random() < spec.binary_share:
+            paths.append(f"{directories}/asset{index}.bin")
+        else:
+            paths.append(f"{directories}/file{index}{rng.choice(EXTENSIONS)}")
+    return paths
+
+
+def _text(rng: random.Random, previous: List[bytes]) -> List[bytes]:
+    # Keep most of the previous lines so the diffs look like edits rather
+    # than rewrites.
+    lines = [line for line in previous if rng.random() > 0.2]
+    for _ in range(rng.randint(1, 30)):
+        lines.insert(rng.randint(0, len(lines)),
+                     f"line {rng.getrandbits(32):08x}\n".encode('ascii'))
+    return lines
+
+
+def write_stream(spec: RepoSpec, out: IO[bytes]):
+    rng = random.Random(spec.seed)
+    authors = [(f"Author {index:03d}", f"author{index}@example.com")
+               for index in range(spec.authors)]
+    # A few prolific authors, like most real projects.
+    weights = [1 / (rank + 1) for rank in range(spec.authors)]
+    paths = _paths(spec, rng)
+    contents = {}
+
+    for mark in range(1, spec.commits + 1):
+        name, email = rng.choices(authors, weights)[0]
+        timestamp = START_TIME + mark * COMMIT_INTERVAL
+        message = f"commit {mark}\n".encode('ascii')
+        out.write(b"commit refs/heads/main\n")
+        out.write(f"mark :{mark}\n".encode('ascii'))
+        out.write(f"author {name} <{email}> {timestamp} +0000\n".encode('utf-8'))
+        out.write(f"committer {name} <{email}> {timestamp} +0000\n".encode('utf-8'))
+        out.write(f"data {len(message)}\n".encode('ascii') + message)
+        if mark > 1:
+            out.write(f"from :{mark - 1}\n".encode('ascii'))
+        for path in rng.sample(paths, min(spec.files_per_commit, len(paths))):
+            if path.endswith('.bin'):
+                data = rng.randbytes(rng.randint(64, 512)) + b'\0'
+            else:
+                lines = contents[path] = _text(rng, contents.get(path, []))
+                data = b''.join(lines)
+            out.write(f"M 100644 inline {path}\n".encode('utf-8'))
+            out.write(f"data {len(data)}\n".encode('ascii') + data + b"\n")
+        out.write(b"\n")
+    out.write(b"done\n")
+
+
+def build_repo(path: Path, spec: RepoSpec) -> Path:
+    """
+    Creates the repository at `path` unless a finished one is already
+    there. Raises subprocess.CalledProcessError when git fails.
+    """
+    marker = path / '.git' / 'synthetic-spec'
+    if marker.exists() and marker.read_text() == spec.slug():
+        return path
+    path.mkdir(parents=True, exist_ok=True)
+    subprocess.run(['git', 'init', '-q', '-b', 'main', str(path)], check=True)
+    process = subprocess.Popen(['git', 'fast-import', '--quiet', '--done'],
+                               cwd=str(path), stdin=subprocess.PIPE)
+    write_stream(spec, process.stdin)
+    process.stdin.close()
+    if process.wait() != 0:
+        raise subprocess.CalledProcessError(process.returncode, 'git fast-import')
+    subprocess.run(['git', 'reset', '-q', '--hard', 'main'], cwd=str(path), check=True)
+    marker.write_text(spec.slug())
+    return path
+
+
+def add_spec_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--commits', type=int, default=2000, help='Number of commits (default: 2000)')
+    parser.add_argument('--authors', type=int, default=20, help='Number of authors (default: 20)')
+    parser.add_argument('--files-per-commit', type=int, default=5,
+                        help='Files changed by each commit (default: 5)')
+    parser.add_argument('--binary-share', type=float, default=0.05,
+                        help='Share of files that are binary (default: 0.05)')
+    parser.add_argument('--file-pool', type=int, default=500,
+                        help='Number of distinct paths (default: 500)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed (default: 1)')
+
+
+def spec_from_args(args) -> RepoSpec:
+    return RepoSpec(args.commits, args.authors, args.files_per_commit,
+                    args.binary_share, args.file_pool, args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic Git repository.')
+    parser.add_argument('path', type=Path, help='Directory to create the repository in')
+    add_spec_arguments(parser)
+    args = parser.parse_args()
+    try:
+        build_repo(args.path.resolve(), spec_from_args(args))
+    except (OSError, subprocess.CalledProcessError) as e:
+        sys.stderr.write(f"Could not build the repository: {e}\n")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
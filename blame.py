@@ -0,0 +1,101 @@
+# blame.py
+
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from cache import StatsCache
+from git import GitResults, GitUtils
+from profiling import profiler
+
+
+def blame_file(repo_path: Path, revision: str, path: str) -> Dict[str, int]:
+    """
+    Lines of one file at `revision` that each author last touched. A file
+    git cannot blame counts for nobody.
+    """
+    result = profiler.run(
+        ['git', 'blame', '--incremental', '--porcelain', revision, '--', path],
+        cwd=str(repo_path),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL
+    )
+    if result.returncode != 0:
+        return {}
+
+    # Each group of lines opens with "<commit> <orig> <final> <count>"; the
+    # author follows the first group that names a commit.
+    commit_lines: Dict[bytes, int] = {}
+    commit_authors: Dict[bytes, bytes] = {}
+    commit = b''
+    for line in result.stdout.split(b'\n'):
+        if line.startswith(b'author '):
+            commit_authors.setdefault(commit, line[7:])
+            continue
+        fields = line.split(b' ')
+        if len(fields) == 4 and len(fields[0]) in (40, 64) and fields[3].isdigit():
+            commit = fields[0]
+            commit_lines[commit] = commit_lines.get(commit, 0) + int(fields[3])
+
+    lines: Dict[str, int] = {}
+    for commit, count in commit_lines.items():
+        author = commit_authors.get(commit, b'').decode('utf-8', errors='replace')
+        lines[author] = lines.get(author, 0) + count
+    return lines
+
+
+class BlameEngine:
+    """
+    Counts the lines each author owns in a revision's tree by blaming every
+    source file on a pool of worker threads, each driving its own git
+    process. Per-file counts are cached by blob id and path, so a later run
+    only blames the files whose content changed. The path is part of the
+    key because blame follows a file's own history: a copy of another
+    file's content belongs to whoever added the copy.
+    """
+
+    def __init__(self, repo_path: Path, jobs: Optional[int] = None,
+                 use_cache: bool = True):
+        self.repo_path = repo_path
+        self.jobs = jobs or os.cpu_count() or 4
+        self.cache = StatsCache(repo_path, name='blame') if use_cache else None
+
+    def source_files(self, revision: str) -> List[Tuple[str, str]]:
+        """
+        `(blob id, path)` for each file whose extension maps to a language.
+        """
+        return [
+            (oid, path) for mode, oid, path in GitUtils.list_tree_blobs(self.repo_path, revision)
+            if mode != '120000'
+            and GitUtils.map_extension_to_language(Path(path).suffix.lower())
+        ]
+
+    def run(self, revision: str = 'HEAD') -> Dict[str, int]:
+        # "<blob id> <path>": ids have a fixed length, so paths may hold spaces.
+        files = {f"{oid} {path}": path for oid, path in self.source_files(revision)}
+        cached = self.cache.load() if self.cache else None
+        blamed: Dict[str, Dict[str, int]] = cached['results'] if cached else {}
+
+        pending = [key for key in files if key not in blamed]
+        if pending:
+            with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+                counts = executor.map(
+                    lambda key: blame_file(self.repo_path, revision, files[key]),
+                    pending)
+                blamed.update(zip(pending, counts))
+
+        owned: Dict[str, int] = {}
+        for key in files:
+            for author, count in blamed[key].items():
+                owned[author] = owned.get(author, 0) + count
+
+        if self.cache and (pending or blamed.keys() != files.keys()):
+            # Only files of the current tree are kept, so the cache never
+            # grows past the size of one checkout.
+            self.cache.save(revision, {key: blamed[key] for key in files})
+        return owned
+
+    def apply(self, git_results: GitResults, revision: str = 'HEAD'):
+        with profiler.phase('blame'):
+            git_results.set_ownership(self.run(revision))
@@ -0,0 +1,176 @@
+# branches.py
+
+import sys
+from itertools import chain, repeat
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from display import Prompts
+from git import GitResults, GitUtils, NumstatParser, _walk_shard
+from profiling import profiler
+
+
+def split_records(chunks: Iterable[bytes], counts: List[int]) -> Iterator[Tuple[int, bytes]]:
+    """
+    Cuts a numstat log into consecutive groups of `counts[i]` commit
+    records, yielding `(group, piece)` pairs. Pieces of one group arrive in
+    order and a group never resumes once the next one has started.
+    """
+    group = 0
+    remaining = counts[0]
+    for chunk in chunks:
+        position = 0
+        while True:
+            # Each record starts with RS; the first start past this group's
+            # share is where the next group begins.
+            starts = chunk.count(b'\x1e', position)
+            if starts <= remaining or group == len(counts) - 1:
+                remaining -= starts
+                yield group, chunk[position:]
+                break
+            cut = position
+            for _ in range(remaining + 1):
+                cut = chunk.index(b'\x1e', cut) + 1
+            cut -= 1
+            if cut > position:
+                yield group, chunk[position:cut]
+            group += 1
+            remaining = counts[group]
+            position = cut
+
+
+class BranchAnalysis:
+    """
+    Contributor statistics for several branches from one pass over their
+    combined history. A single topologically ordered rev-list gives every
+    commit a bit mask of the refs that reach it; commits are grouped by
+    mask and one `git log --stdin` reads each distinct commit once, its
+    output cut at the group boundaries. Per-branch numbers are then sums
+    over the groups, so the cost follows the number of distinct commits
+    rather than branches times history.
+    """
+
+    def __init__(self, repo_path: Path, refs: Optional[List[str]] = None, jobs: int = 1):
+        self.repo_path = repo_path
+        self.jobs = jobs
+        resolved = self._resolve_refs(refs)
+        self.refs: List[str] = [name for name, _ in resolved]
+        self.tips: List[str] = [oid for _, oid in resolved]
+        self.groups: Dict[int, GitResults] = {}
+        self.group_sizes: Dict[int, int] = {}
+        self._combined: Optional[GitResults] = None
+
+    def _resolve_refs(self, refs: Optional[List[str]]) -> List[Tuple[str, str]]:
+        if not refs:
+            return GitUtils.list_branch_refs(self.repo_path)
+        session = GitUtils.session(self.repo_path)
+        resolved = []
+        for name in dict.fromkeys(refs):
+            found = session.resolve(f"{name}^{{commit}}")
+            if found is None:
+                Prompts.error_prompt(f"Error: '{name}' does not name a commit.")
+                sys.exit(1)
+            resolved.append((name, found[0]))
+        return resolved
+
+    def run(self) -> 'BranchAnalysis':
+        if not self.tips:
+            return self
+        with profiler.phase('reachability'):
+            grouped = self._group_commits()
+        with profiler.phase('walk'):
+            if self.jobs > 1:
+                self._walk_parallel(grouped)
+            else:
+                self._walk(grouped)
+        profiler.note('distinct_commits', sum(self.group_sizes.values()))
+        profiler.note('commit_groups', len(self.groups))
+        return self
+
+    def _group_commits(self) -> Dict[int, List[str]]:
+        masks: Dict[str, int] = {}
+        for bit, tip in enumerate(self.tips):
+            masks[tip] = masks.get(tip, 0) | 1 << bit
+        grouped: Dict[int, List[str]] = {}
+        # Children come before their parents, so a commit's mask is final
+        # by the time it is read and can be pushed down to its parents.
+        for commit, *parents in GitUtils.list_commit_parents(self.repo_path, self.tips):
+            mask = masks.pop(commit)
+            grouped.setdefault(mask, []).append(commit)
+            for parent in parents:
+                masks[parent] = masks.get(parent, 0) | mask
+        self.group_sizes = {mask: len(commits) for mask, commits in grouped.items()}
+        return grouped
+
+    def _walk(self, grouped: Dict[int, List[str]]):
+        masks = list(grouped)
+        parsers = []
+        for mask in masks:
+            self.groups[mask] = GitResults(track_paths=False)
+            parsers.append(NumstatParser(self.groups[mask]))
+        chunks = GitUtils.stream_git_data(
+            self.repo_path, commits=list(chain.from_iterable(grouped.values())))
+        for group, piece in split_records(chunks, [len(grouped[mask]) for mask in masks]):
+            with profiler.phase('parse'):
+                parsers[group].feed(piece)
+        with profiler.phase('parse'):
+            for parser in parsers:
+                parser.close()
+
+    def _walk_parallel(self, grouped: Dict[int, List[str]]):
+        total = sum(map(len, grouped.values()))
+        shard_size = -(-total // (self.jobs * GitUtils.SHARDS_PER_JOB))
+        shards = [(mask, commits[start:start + shard_size])
+                  for mask, commits in grouped.items()
+                  for start in range(0, len(commits), shard_size)]
+        from concurrent.futures import ProcessPoolExecutor
+        for mask in grouped:
+            self.groups[mask] = GitResults(track_paths=False)
+        with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+            results = executor.map(_walk_shard, repeat(self.repo_path),
+                                   [commits for _, commits in shards],
+                                   repeat((None, None, False)))
+            for (mask, _), shard_data in zip(shards, results):
+                with profiler.phase('merge'):
+                    self.groups[mask].merge(GitResults.from_dict(shard_data))
+
+    def _bit(self, ref: str) -> int:
+        return 1 << self.refs.index(ref)
+
+    def combined(self) -> GitResults:
+        """
+        Totals over every analyzed ref, each shared commit counted once.
+        """
+        if self._combined is None:
+            self._combined = self._merge_groups(lambda mask: True)
+        return self._combined
+
+    def branch_results(self, ref: str) -> GitResults:
+        """
+        Totals for everything reachable from one ref.
+        """
+        bit = self._bit(ref)
+        return self._merge_groups(lambda mask: mask & bit)
+
+    def unique_results(self, ref: str) -> GitResults:
+        """
+        Totals for the commits that only this ref reaches.
+        """
+        return self.groups.get(self._bit(ref)) or GitResults()
+
+    def _merge_groups(self, wanted) -> GitResults:
+        merged = GitResults()
+        for mask, git_results in self.groups.items():
+            if wanted(mask):
+                merged.merge(git_results)
+        return merged
+
+    def summary(self) -> List[Tuple[str, int, int]]:
+        """
+        `(ref, reachable commits, unique commits)` for each analyzed ref.
+        """
+        rows = []
+        for ref in self.refs:
+            bit = self._bit(ref)
+            reachable = sum(size for mask, size in self.group_sizes.items() if mask & bit)
+            rows.append((ref, reachable, self.group_sizes.get(bit, 0)))
+        return rows
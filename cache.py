@@ -0,0 +1,161 @@
+# cache.py
+
+import hashlib
+import json
+import os
+import struct
+import tempfile
+from pathlib import Path
+from typing import Optional
+from series import CommitSeries
+
+# Each run's rows are appended as one segment: this header, the head the
+# rows were read up to, then every column's bytes in CommitSeries order.
+SEGMENT_HEADER = struct.Struct('<HI')
+
+
+def get_cache_dir() -> Path:
+    override = os.environ.get('GIT_MEASURE_CACHE_DIR')
+    if override:
+        return Path(override)
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'git-measure'
+
+
+class StatsCache:
+    """
+    On-disk store of the aggregated results for one repository, keyed by the
+    last commit that was folded into them.
+
+    A per-commit series only ever grows, so it is kept apart from the JSON:
+    each save appends the new rows to a binary rows file and rewrites only
+    the JSON, which records how many rows and bytes of that file it covers.
+    Bytes past that, left by an interrupted save, are ignored and cut off
+    by the next one.
+    """
+    VERSION = 10
+
+    def __init__(self, repo_path: Path, name: str = 'stats'):
+        self.repo_path = repo_path
+        digest = hashlib.sha1(str(repo_path).encode('utf-8')).hexdigest()
+        self.cache_path = get_cache_dir() / f"{name}-{digest}.json"
+        self.rows_path = self.cache_path.with_suffix('.rows')
+        # Rows and bytes of the rows file covered by what load() returned.
+        self._stored_rows = 0
+        self._stored_size = 0
+
+    def exists(self) -> bool:
+        """
+        Whether anything has been saved, without reading it.
+        """
+        return self.cache_path.is_file()
+
+    def load(self) -> Optional[dict]:
+        """
+        The saved data; when a series was saved with it, it is returned as
+        a CommitSeries under 'series'.
+        """
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as cache_file:
+                data = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != self.VERSION or data.get('repo') != str(self.repo_path):
+            return None
+        if 'rows' in data:
+            series = self._load_rows(data['rows'], data['rows_size'], data['head'])
+            if series is None:
+                return None
+            data['series'] = series
+            self._stored_rows, self._stored_size = data['rows'], data['rows_size']
+        return data
+
+    def _load_rows(self, rows: int, size: int, head: str) -> Optional[CommitSeries]:
+        try:
+            with open(self.rows_path, 'rb') as rows_file:
+                data = rows_file.read(size)
+        except OSError:
+            return None
+        if len(data) != size:
+            return None
+        series = CommitSeries()
+        position = 0
+        last_head = ''
+        while position < size:
+            head_size, count = SEGMENT_HEADER.unpack_from(data, position)
+            position += SEGMENT_HEADER.size
+            last_head = data[position:position + head_size].decode('ascii', errors='replace')
+            position += head_size
+            for name in CommitSeries.COLUMNS:
+                column = getattr(series, name)
+                end = position + count * column.itemsize
+                column.frombytes(data[position:end])
+                position = end
+        # Another process saving at the same time could have replaced the
+        # rows under this JSON; the last segment names the head it belongs to.
+        if position != size or len(series) != rows or rows and last_head != head:
+            return None
+        return series
+
+    def save(self, head: str, results: dict, series: Optional[CommitSeries] = None,
+             appended: bool = False):
+        """
+        Saves `results` and, when given, `series` in the rows file. With
+        `appended`, `series` starts with the rows load() returned and only
+        the rows after them are written.
+        """
+        data = {
+            'version': self.VERSION,
+            'repo': str(self.repo_path),
+            'head': head,
+            'results': results,
+        }
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            if series is not None:
+                data['rows'] = len(series)
+                data['rows_size'] = self._save_rows(head, series, appended)
+            fd, tmp_path = tempfile.mkstemp(
+                dir=self.cache_path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as cache_file:
+                json.dump(data, cache_file, separators=(',', ':'))
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            # The cache is an optimisation only; a read-only home directory
+            # must not stop the analysis from completing.
+            pass
+        else:
+            if series is not None:
+                self._stored_rows, self._stored_size = data['rows'], data['rows_size']
+
+    def _save_rows(self, head: str, series: CommitSeries, appended: bool) -> int:
+        start = self._stored_rows if appended else 0
+        segment = self._segment(head, series, start)
+        if appended and self._stored_size:
+            try:
+                with open(self.rows_path, 'r+b') as rows_file:
+                    rows_file.truncate(self._stored_size)
+                    rows_file.seek(self._stored_size)
+                    rows_file.write(segment)
+                return self._stored_size + len(segment)
+            except FileNotFoundError:
+                segment = self._segment(head, series, 0)
+        fd, tmp_path = tempfile.mkstemp(dir=self.rows_path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as rows_file:
+            rows_file.write(segment)
+        os.replace(tmp_path, self.rows_path)
+        return len(segment)
+
+    @staticmethod
+    def _segment(head: str, series: CommitSeries, start: int) -> bytes:
+        encoded_head = head.encode('ascii')
+        parts = [SEGMENT_HEADER.pack(len(encoded_head), len(series) - start), encoded_head]
+        parts += [getattr(series, name)[start:].tobytes() for name in CommitSeries.COLUMNS]
+        return b''.join(parts)
+
+    def clear(self):
+        for path in (self.cache_path, self.rows_path):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
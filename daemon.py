@@ -0,0 +1,266 @@
+# daemon.py
+
+import argparse
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from display import Prompts
+from export import rows_to
+from git import GitData, GitResults, GitUtils, WalkFilter
+from session import GitSession
+
+
+def default_socket_path() -> Path:
+    base = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    user = os.getuid() if hasattr(os, 'getuid') else os.getlogin()
+    return Path(base) / f"git-measure-{user}.sock"
+
+
+def estimate_memory(git_results: GitResults) -> int:
+    """
+    Rough resident size of one repository's results, in bytes: the typed
+    columns at their item size plus a flat allowance per author, per
+    commit-size sketch item and per directory statistic.
+    """
+    series = git_results.series
+    size = sum(column.itemsize * len(column) for column in (
+        series.timestamps, series.author_ids, series.insertions,
+        series.deletions, series.files))
+    size += len(git_results) * 256
+    size += sum(sizes.size() for sizes in git_results.sizes) * 36
+    paths = git_results.paths
+    size += len(paths) * 200 + sum(len(totals) for totals in paths.totals) * 120
+    return size
+
+
+class _ThreadOutput:
+    """
+    Stands in for stdout or stderr and sends what each request thread
+    prints to that thread's buffer, so concurrent queries do not mix.
+    """
+
+    def __init__(self, default):
+        self._default = default
+        self._local = threading.local()
+
+    def capture(self, buffer: Optional[io.StringIO]):
+        self._local.buffer = buffer
+
+    def _target(self):
+        return getattr(self._local, 'buffer', None) or self._default
+
+    def write(self, text: str) -> int:
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+
+class RepoRegistry:
+    """
+    Loaded repositories, most recently used last. A repository is reloaded
+    on its next query once HEAD has moved (from the stats cache, so only
+    the new commits are read), and the least recently used ones are
+    dropped while the estimated total is over the memory budget.
+    """
+
+    def __init__(self, memory_budget: int, jobs: int = 1):
+        self.memory_budget = memory_budget
+        self.jobs = jobs
+        self._lock = threading.Lock()
+        # key -> [lock, git data, estimated bytes]
+        self._entries: 'OrderedDict[tuple, list]' = OrderedDict()
+
+    def get(self, repo_path: Path, args: argparse.Namespace,
+            walk_filter: Optional[WalkFilter] = None) -> GitData:
+        key = (repo_path, args.path_depth, args.path_nodes,
+               walk_filter.key() if walk_filter else None)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = [threading.Lock(), None, 0]
+            self._entries.move_to_end(key)
+        with entry[0]:
+            git_data = entry[1]
+            # --no-cache re-reads the whole history, as it does outside the
+            # daemon, and the fresh data replaces what was kept.
+            if git_data is None or args.no_cache or \
+                    git_data.head != GitUtils.get_head_commit(repo_path):
+                git_data = GitData(repo_path, use_cache=not args.no_cache, jobs=self.jobs,
+                                   path_depth=args.path_depth, path_nodes=args.path_nodes,
+                                   walk_filter=walk_filter)
+                entry[1] = git_data
+                entry[2] = estimate_memory(git_data.git_results)
+        self._evict(key)
+        return git_data
+
+    def _evict(self, keep: tuple):
+        with self._lock:
+            total = sum(entry[2] for entry in self._entries.values())
+            for key in list(self._entries):
+                if total <= self.memory_budget:
+                    break
+                if key == keep:
+                    continue
+                total -= self._entries.pop(key)[2]
+                if not any(other[0] == key[0] for other in self._entries):
+                    GitSession.release(key[0])
+
+    def loaded(self) -> List[Tuple[Path, int]]:
+        with self._lock:
+            return [(key[0], entry[2]) for key, entry in self._entries.items()]
+
+
+class _QueryHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            argv, cwd = request['argv'], Path(request['cwd'])
+        except (ValueError, KeyError, TypeError):
+            return
+        started = time.perf_counter()
+        reply = self.server.answer(argv, cwd)
+        reply['seconds'] = time.perf_counter() - started
+        self.wfile.write(json.dumps(reply).encode('utf-8') + b'\n')
+
+
+class QueryServer(socketserver.ThreadingUnixStreamServer):
+    """
+    Answers command-line queries sent over a Unix socket, one JSON request
+    and one JSON reply per connection. Each query runs through the normal
+    command-line code with its output captured, so replies match what the
+    command prints when run directly.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path: Path, registry: RepoRegistry,
+                 build_parser: Callable[[], argparse.ArgumentParser],
+                 run_query: Callable):
+        self.registry = registry
+        self.build_parser = build_parser
+        self.run_query = run_query
+        self.stdout = _ThreadOutput(sys.stdout)
+        self.stderr = _ThreadOutput(sys.stderr)
+        super().__init__(str(socket_path), _QueryHandler)
+
+    def answer(self, argv: List[str], cwd: Path) -> Dict[str, object]:
+        stdout, stderr = io.StringIO(), io.StringIO()
+        self.stdout.capture(stdout)
+        self.stderr.capture(stderr)
+        status = 0
+        try:
+            with rows_to(stdout):
+                args = self.build_parser().parse_args(argv)
+                # The profiler is shared by the whole process, so it cannot
+                # time one query among many.
+                if args.daemon or args.profile or args.profile_trace or args.cprofile:
+                    Prompts.error_prompt(
+                        "Error: --daemon and the profiling options cannot be sent to the daemon.")
+                    raise SystemExit(1)
+                resolve_paths(args, cwd)
+                self.run_query(args, self.registry.get)
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) else 1
+        except Exception as e:
+            Prompts.error_prompt(f"Error: {e}")
+            status = 1
+        finally:
+            self.stdout.capture(None)
+            self.stderr.capture(None)
+        return {'status': status, 'stdout': stdout.getvalue(), 'stderr': stderr.getvalue()}
+
+
+def resolve_paths(args: argparse.Namespace, cwd: Path):
+    # Relative paths are relative to the client, not to the daemon.
+    if args.path:
+        args.path = str(cwd / args.path)
+    if args.batch:
+        args.batch = [str(cwd / path) for path in args.batch]
+
+
+def serve(socket_path: Optional[Path], memory_budget_mib: int, jobs: int,
+          build_parser: Callable[[], argparse.ArgumentParser], run_query: Callable):
+    if not hasattr(socket, 'AF_UNIX'):
+        Prompts.error_prompt("Error: --daemon needs Unix domain sockets, which this platform lacks.")
+        sys.exit(1)
+    if memory_budget_mib < 1 or jobs < 1:
+        Prompts.error_prompt("Error: --memory-budget and -j/--jobs must be at least 1.")
+        sys.exit(1)
+    socket_path = socket_path or default_socket_path()
+    if socket_path.exists():
+        if _is_listening(socket_path):
+            Prompts.error_prompt(f"Error: A daemon is already listening on {socket_path}.")
+            sys.exit(1)
+        socket_path.unlink()
+
+    GitUtils.check_git_installed()
+    registry = RepoRegistry(memory_budget_mib * 1024 * 1024, jobs)
+    server = QueryServer(socket_path, registry, build_parser, run_query)
+    os.chmod(socket_path, 0o600)
+    sys.stdout, sys.stderr = server.stdout, server.stderr
+    signal.signal(signal.SIGTERM, _stop)
+    Prompts.info_prompt(f"Listening on {socket_path} (Ctrl-C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        sys.stdout, sys.stderr = server.stdout._default, server.stderr._default
+        socket_path.unlink(missing_ok=True)
+        for repo_path, _ in registry.loaded():
+            GitSession.release(repo_path)
+        Prompts.info_prompt("Daemon stopped.")
+
+
+def _stop(signum, frame):
+    # Shut down the same way as on Ctrl-C so the socket is removed.
+    raise KeyboardInterrupt
+
+
+def _is_listening(socket_path: Path) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(str(socket_path))
+        except OSError:
+            return False
+    return True
+
+
+def forward_query(argv: List[str], socket_path: Optional[Path] = None) -> int:
+    """
+    Sends a command line to the daemon and prints its reply. Returns the
+    exit status the query would have had if run here.
+    """
+    socket_path = socket_path or default_socket_path()
+    argv = [arg for arg in argv if arg != '--connect' and not arg.startswith('--socket=')]
+    if '--socket' in argv:
+        index = argv.index('--socket')
+        del argv[index:index + 2]
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(str(socket_path))
+            connection.sendall(json.dumps({'argv': argv, 'cwd': os.getcwd()}).encode('utf-8') + b'\n')
+            with connection.makefile('rb') as replies:
+                reply = json.loads(replies.readline())
+    except (OSError, ValueError):
+        Prompts.error_prompt(
+            f"Error: No daemon answered on {socket_path}. Start one with --daemon.")
+        return 1
+    sys.stdout.write(reply['stdout'])
+    sys.stdout.flush()
+    sys.stderr.write(reply['stderr'])
+    return reply['status']
@@ -1,9 +1,16 @@
 
 from colorama import Fore, Style, init
+from typing import List, Optional
 import sys
+from author_index import AuthorIndex
 
 init(autoreset=True)
 
+# A commit this many times an author's p90, and at least this large, is
+# flagged as an outlier such as a vendored import.
+OUTLIER_RATIO = 10
+OUTLIER_MIN_LINES = 1000
+
 
 class Prompts:
     @staticmethod
@@ -67,6 +74,96 @@ def display_author_stats(author_result):
     Prompts.color_print("-+-".join(['-' * w for w in col_widths]), Fore.CYAN)
 
     Prompts.color_print(format_str.format(*row), Fore.RESET)
+    display_size_distribution(author_result.sizes, author_result.commits)
+
+
+def display_size_distribution(sizes, file_changes: int):
+    """
+    Median, p90 and p99 commit size from an author's sketch, flagging
+    authors whose largest commit dwarfs the rest of their work. The sketch
+    counts each commit once while the Commits column counts each file it
+    changed, so both counts are shown with their units.
+    """
+    if not sizes:
+        return
+    p90 = sizes.quantile(0.9)
+    Prompts.color_print(
+        f"Commit size (lines changed): median {sizes.quantile(0.5):,}, p90 {p90:,}, "
+        f"p99 {sizes.quantile(0.99):,}, largest {sizes.max:,} over {len(sizes):,} commits "
+        f"({file_changes:,} file changes, as counted in Commits)",
+        Fore.RESET)
+    if sizes.max >= OUTLIER_RATIO * max(p90, 1) and sizes.max >= OUTLIER_MIN_LINES:
+        Prompts.color_print(
+            f"Outlier: the largest commit is {sizes.max / max(p90, 1):,.0f}x the p90, "
+            f"so the totals are dominated by a few commits; -by m ranks by typical size.",
+            Fore.YELLOW)
+
+
+def display_author_timeline(timeline: list, period: str):
+    if not timeline:
+        Prompts.color_print(
+            "No commits were found for the specified author in this window.",
+            Fore.YELLOW
+        )
+        return
+
+    headers = [
+        Prompts.color_text(Fore.CYAN, period.capitalize()),
+        Prompts.color_text(Fore.GREEN, "Commits"),
+        Prompts.color_text(Fore.GREEN, "Insertions"),
+        Prompts.color_text(Fore.RED, "Deletions"),
+        Prompts.color_text(Fore.YELLOW, "Net Contribution")
+    ]
+
+    col_widths = [10, 10, 15, 15, 20]
+    format_str = " | ".join([f"{{:<{w}}}" for w in col_widths])
+
+    Prompts.color_print(format_str.format(*headers), Fore.CYAN)
+    Prompts.color_print("-+-".join(['-' * w for w in col_widths]), Fore.CYAN)
+
+    for label, commits, insertions, deletions in timeline:
+        row = [
+            label,
+            f"{commits:,}",
+            f"{insertions:,}",
+            f"{deletions:,}",
+            f"{insertions - deletions:,}"
+        ]
+        Prompts.color_print(format_str.format(*row), Fore.RESET)
+
+
+def display_author_query(git_results, query: str, since=None, until=None,
+                         bucket=None, candidates: Optional[List[str]] = None) -> bool:
+    """
+    Shows the statistics of every author the query resolves to, or "did you
+    mean" suggestions when it resolves to nobody. Suggestions come from
+    `candidates` when given, for results that hold only some authors.
+    Returns whether any author matched.
+    """
+    matches = git_results.resolve_author(query)
+    if not matches:
+        Prompts.error_prompt(f"Author '{query}' not found in the repository.")
+        index = git_results.author_index() if candidates is None else AuthorIndex(candidates, {})
+        suggestions = index.suggest(query)
+        if suggestions:
+            Prompts.color_print(
+                f"Did you mean: {', '.join(suggestions)}?", Fore.YELLOW)
+        return False
+
+    windowed = None
+    if since is not None or until is not None:
+        windowed = git_results.window(since, until)
+    for author_result in matches:
+        author = author_result.author
+        if author != query:
+            Prompts.info_prompt(f"Showing results for '{author}'")
+        if windowed is not None:
+            author_result = windowed.get_contribution(author)
+        display_author_stats(author_result)
+        if bucket:
+            display_author_timeline(
+                git_results.get_timeline(author, bucket, since, until), bucket)
+    return True
 
 
 def display_top_contributors(top_contributors: list, by: str):
@@ -85,42 +182,253 @@ def display_top_contributors(top_contributors: list, by: str):
     ]
 
     col_widths = [5, 25, 10, 15, 15, 20]
+    if by == 'o':
+        headers.append(Prompts.color_text(Fore.MAGENTA, "Lines Owned"))
+        col_widths.append(15)
+    elif by == 'm':
+        # Commits above counts file changes; the volume is distinct
+        # commits times the median size, so that count is shown too.
+        headers.append(Prompts.color_text(Fore.MAGENTA, "Distinct Commits"))
+        headers.append(Prompts.color_text(Fore.MAGENTA, "Median Size"))
+        headers.append(Prompts.color_text(Fore.MAGENTA, "Median Volume"))
+        col_widths += [16, 12, 15]
     format_str = " | ".join([f"{{:<{w}}}" for w in col_widths])
 
     Prompts.color_print(format_str.format(*headers), Fore.CYAN)
     Prompts.color_print("-+-".join(['-' * w for w in col_widths]), Fore.CYAN)
 
-    for contributor in top_contributors:
+    # The rows share one color, so they are printed as a single block.
+    lines = []
+    for rank, contributor in top_contributors:
         row = [
-            f"{contributor.rank}",
+            f"{rank}",
             contributor.author,
             f"{contributor.commits:,}",
             f"{contributor.insertions:,}",
             f"{contributor.deletions:,}",
             f"{contributor.net:,}"
         ]
+        if by == 'o':
+            row.append(f"{contributor.owned:,}")
+        elif by == 'm':
+            row.append(f"{contributor.distinct_commits:,}")
+            row.append(f"{contributor.median_size:,}")
+            row.append(f"{contributor.median_volume:,}")
+        lines.append(format_str.format(*row))
+    Prompts.color_print("\n".join(lines), Fore.RESET)
+
+
+def display_estimated_contributors(sample, top_contributors: list):
+    """
+    Ranking estimated from a commit sample: every figure is marked with
+    "~" and followed by the half-width of its 95% confidence interval.
+    """
+    drawn = "evenly across time" if sample.mode == 'stratified' else "uniformly"
+    Prompts.color_print(
+        f"Estimated from {sample.sampled:,} of {len(sample):,} commits, drawn {drawn}; "
+        f"\u00b1 is a 95% confidence margin.", Fore.YELLOW)
+    count, margin = sample.distinct_authors()
+    Prompts.color_print(f"Distinct authors: ~{count:,.0f} \u00b1 {margin:,.0f}", Fore.YELLOW)
+    if not top_contributors:
+        Prompts.color_print(
+            "No contributions found in the repository.", Fore.YELLOW)
+        return
+
+    headers = [
+        Prompts.color_text(Fore.CYAN, "Rank"),
+        Prompts.color_text(Fore.CYAN, "Author"),
+        Prompts.color_text(Fore.GREEN, "Commits"),
+        Prompts.color_text(Fore.GREEN, "Insertions"),
+        Prompts.color_text(Fore.RED, "Deletions"),
+        Prompts.color_text(Fore.YELLOW, "Net Contribution")
+    ]
+
+    col_widths = [5, 25, 18, 22, 22, 22]
+    format_str = " | ".join([f"{{:<{w}}}" for w in col_widths])
+
+    Prompts.color_print(format_str.format(*headers), Fore.CYAN)
+    Prompts.color_print("-+-".join(['-' * w for w in col_widths]), Fore.CYAN)
+
+    lines = []
+    for rank, estimate in top_contributors:
+        row = [f"{rank}", estimate.author]
+        for metric in ('commits', 'insertions', 'deletions', 'net'):
+            row.append(f"~{getattr(estimate, metric):,.0f} \u00b1 {estimate.margins[metric]:,.0f}")
+        lines.append(format_str.format(*row))
+    Prompts.color_print("\n".join(lines), Fore.RESET)
+
+
+def display_path_owners(path: str, owners: list, total_lines: int):
+    if not owners:
+        Prompts.color_print(
+            f"No contributions were found under '{path}'.", Fore.YELLOW)
+        return
+
+    headers = [
+        Prompts.color_text(Fore.CYAN, "Rank"),
+        Prompts.color_text(Fore.CYAN, "Author"),
+        Prompts.color_text(Fore.GREEN, "Insertions"),
+        Prompts.color_text(Fore.RED, "Deletions"),
+        Prompts.color_text(Fore.YELLOW, "Share of Insertions")
+    ]
+
+    col_widths = [5, 25, 15, 15, 20]
+    format_str = " | ".join([f"{{:<{w}}}" for w in col_widths])
+
+    Prompts.color_print(format_str.format(*headers), Fore.CYAN)
+    Prompts.color_print("-+-".join(['-' * w for w in col_widths]), Fore.CYAN)
+
+    for rank, owner in owners:
+        share = owner.insertions / total_lines if total_lines else 0.0
+        row = [
+            f"{rank}",
+            owner.author,
+            f"{owner.insertions:,}",
+            f"{owner.deletions:,}",
+            f"{share:.1%}"
+        ]
         Prompts.color_print(format_str.format(*row), Fore.RESET)
 
 
-def display_repo_info(git_data):
+def display_path_query(git_results, path: str, top_n: int = 10, offset: int = 0,
+                       by: Optional[str] = None) -> bool:
+    """
+    Shows who changed the most under a directory: its owners ranked by
+    insertions, or its top contributors when a ranking metric is given.
+    Returns whether the directory is tracked.
+    """
+    path_results = git_results.path_results(path)
+    if path_results is None:
+        if git_results.paths.is_beyond_limits(path):
+            Prompts.error_prompt(
+                f"'{path}' is beyond the depth or size limit of the path statistics.")
+        else:
+            Prompts.error_prompt(f"No changes were recorded under '{path}'.")
+        return False
+    if by is not None:
+        display_top_contributors(path_results.get_top_contributors(
+            by=by, top_n=top_n, offset=offset), by)
+    else:
+        display_path_owners(path, path_results.get_top_contributors(
+            by='i', top_n=top_n, offset=offset), path_results.totals()['insertions'])
+    return True
+
+
+def display_branch_summary(rows: list):
+    headers = [
+        Prompts.color_text(Fore.CYAN, "Branch"),
+        Prompts.color_text(Fore.GREEN, "Reachable Commits"),
+        Prompts.color_text(Fore.YELLOW, "Unique Commits")
+    ]
+
+    col_widths = [max([30] + [len(ref) for ref, _, _ in rows]), 20, 20]
+    format_str = " | ".join([f"{{:<{w}}}" for w in col_widths])
+
+    Prompts.color_print(format_str.format(*headers), Fore.CYAN)
+    Prompts.color_print("-+-".join(['-' * w for w in col_widths]), Fore.CYAN)
+
+    lines = [format_str.format(ref, f"{reachable:,}", f"{unique:,}")
+             for ref, reachable, unique in rows]
+    Prompts.color_print("\n".join(lines), Fore.RESET)
+    Prompts.color_print("", Fore.RESET)
+
+
+def display_repo_info(git_data, sample=None):
+    """
+    With a commit sample, the dates come from its commit list and the
+    authors are a sketched count instead of a list.
+    """
     headers = [
         Prompts.color_text(Fore.CYAN, "Repository Information")
     ]
     Prompts.color_print("\n".join(headers), Fore.CYAN)
     Prompts.color_print("-" * 50, Fore.CYAN)
 
+    if sample is not None:
+        creation_date, last_commit_date = sample.first_commit_date, sample.last_commit_date
+        count, margin = sample.distinct_authors()
+        authors = (f"~{count:,.0f} \u00b1 {margin:,.0f} "
+                   f"(estimated from {len(sample):,} commits)")
+    else:
+        creation_date, last_commit_date = git_data.creation_date, git_data.last_commit_date
+        authors = ", ".join(git_data.authors)
     info = [
         (Prompts.color_text(Fore.YELLOW, "Repository Path:"), git_data.repo_path),
-        (Prompts.color_text(Fore.YELLOW, "Creation Date:"), git_data.creation_date),
-        (Prompts.color_text(Fore.YELLOW, "Last Commit Date:"),
-         git_data.last_commit_date),
+        (Prompts.color_text(Fore.YELLOW, "Creation Date:"), creation_date),
+        (Prompts.color_text(Fore.YELLOW, "Last Commit Date:"), last_commit_date),
         (Prompts.color_text(Fore.YELLOW, "Branches:"), ", ".join(git_data.branches)),
         (Prompts.color_text(Fore.YELLOW, "Predominant Language:"),
          git_data.predominant_language),
-        (Prompts.color_text(Fore.YELLOW, "Authors:"), ", ".join(git_data.authors)),
+        (Prompts.color_text(Fore.YELLOW, "Authors:"), authors),
     ]
 
     for label, value in info:
         Prompts.color_print(f"{label} {value}", Fore.RESET)
 
     Prompts.color_print("", Fore.RESET)
+    display_language_breakdown(git_data.languages)
+
+
+def display_language_breakdown(languages: list):
+    if not languages:
+        return
+    total_bytes = sum(size for _, size, _ in languages)
+    total_files = sum(files for _, _, files in languages)
+
+    headers = [
+        Prompts.color_text(Fore.CYAN, "Language"),
+        Prompts.color_text(Fore.GREEN, "Bytes"),
+        Prompts.color_text(Fore.GREEN, "Share of Bytes"),
+        Prompts.color_text(Fore.YELLOW, "Files"),
+        Prompts.color_text(Fore.YELLOW, "Share of Files")
+    ]
+
+    col_widths = [20, 15, 15, 10, 15]
+    format_str = " | ".join([f"{{:<{w}}}" for w in col_widths])
+
+    Prompts.color_print(format_str.format(*headers), Fore.CYAN)
+    Prompts.color_print("-+-".join(['-' * w for w in col_widths]), Fore.CYAN)
+
+    lines = [format_str.format(
+        language,
+        f"{size:,}",
+        f"{size / total_bytes:.1%}" if total_bytes else "-",
+        f"{files:,}",
+        f"{files / total_files:.1%}"
+    ) for language, size, files in languages]
+    Prompts.color_print("\n".join(lines), Fore.RESET)
+    Prompts.color_print("", Fore.RESET)
+
+
+def display_profile(summary: dict):
+    Prompts.color_print("Profile", Fore.CYAN)
+    Prompts.color_print("-" * 50, Fore.CYAN)
+    Prompts.color_print(f"Wall time: {summary['wall_seconds'] * 1000:,.1f} ms", Fore.RESET)
+    if summary['peak_rss_kib'] is not None:
+        Prompts.color_print(
+            f"Peak RSS: {summary['peak_rss_kib'] / 1024:,.1f} MiB", Fore.RESET)
+
+    col_widths = [20, 8, 12]
+    format_str = " | ".join([f"{{:<{w}}}" for w in col_widths])
+
+    Prompts.color_print("\n" + format_str.format("Phase", "Calls", "Time (ms)"), Fore.CYAN)
+    Prompts.color_print("-+-".join(['-' * w for w in col_widths]), Fore.CYAN)
+    for name, phase in sorted(summary['phases'].items(), key=lambda item: -item[1]['seconds']):
+        Prompts.color_print(format_str.format(
+            name, f"{phase['calls']:,}", f"{phase['seconds'] * 1000:,.1f}"), Fore.RESET)
+
+    col_widths.append(14)
+    format_str = " | ".join([f"{{:<{w}}}" for w in col_widths])
+    Prompts.color_print("\n" + format_str.format("Git Command", "Calls", "Time (ms)", "Bytes Read"),
+                        Fore.CYAN)
+    Prompts.color_print("-+-".join(['-' * w for w in col_widths]), Fore.CYAN)
+    for name, call in sorted(summary['git_calls'].items(), key=lambda item: -item[1]['seconds']):
+        Prompts.color_print(format_str.format(
+            name, f"{call['calls']:,}", f"{call['seconds'] * 1000:,.1f}",
+            f"{call['bytes']:,}"), Fore.RESET)
+
+    if summary['counters']:
+        Prompts.color_print("", Fore.RESET)
+        for name, value in sorted(summary['counters'].items()):
+            Prompts.color_print(f"{name.replace('_', ' ').capitalize()}: {value:,}", Fore.RESET)
+    Prompts.color_print("", Fore.RESET)
@@ -0,0 +1,219 @@
+# export.py
+
+import csv
+import json
+import sys
+import threading
+from contextlib import contextmanager
+from itertools import islice
+from json.encoder import encode_basestring
+from typing import IO, Iterable, List, Optional, Sequence
+
+FORMATS = ('ndjson', 'csv', 'json')
+
+CONTRIBUTOR_FIELDS = ('rank', 'author', 'commits', 'insertions', 'deletions', 'net')
+# Columns added to a ranking by the metrics that need them.
+EXTRA_FIELDS = {'o': ('owned',), 'm': ('distinct_commits', 'median_size', 'median_volume')}
+OWNER_FIELDS = ('rank', 'author', 'insertions', 'deletions', 'share')
+AUTHOR_FIELDS = ('author', 'commits', 'insertions', 'deletions', 'net')
+TIMELINE_FIELDS = ('author', 'period', 'commits', 'insertions', 'deletions', 'net')
+INFO_FIELDS = ('repository', 'creation_date', 'last_commit_date', 'branches',
+               'predominant_language', 'languages', 'authors')
+# Each estimate is followed by the half-width of its 95% confidence interval.
+ESTIMATE_FIELDS = ('rank', 'author', 'commits', 'commits_margin', 'insertions',
+                   'insertions_margin', 'deletions', 'deletions_margin', 'net', 'net_margin')
+SAMPLED_INFO_FIELDS = INFO_FIELDS[:-1] + ('authors_estimate', 'authors_margin', 'commits')
+
+
+_redirect = threading.local()
+
+
+@contextmanager
+def rows_to(stream: IO[str]):
+    """
+    Sends the rows of writers created in this thread to `stream` instead
+    of stdout.
+    """
+    previous = getattr(_redirect, 'stream', None)
+    _redirect.stream = stream
+    try:
+        yield
+    finally:
+        _redirect.stream = previous
+
+
+def _json_value(value) -> str:
+    if isinstance(value, str):
+        return encode_basestring(value)
+    if isinstance(value, (list, tuple, dict)) or value is None:
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+class RowWriter:
+    """
+    Writes result rows as NDJSON, CSV or one JSON array. Output is built a
+    block at a time from whole columns, with no color handling, and goes to
+    the real stdout in one write per block instead of a print per row.
+    """
+    BLOCK_ROWS = 65536
+
+    def __init__(self, fmt: str, fields: Sequence[str], stream: Optional[IO[str]] = None):
+        self.fmt = fmt
+        self.fields = tuple(fields)
+        # colorama wraps sys.stdout to rewrite escape codes; plain data
+        # does not need that, so it goes to the stream underneath.
+        self.stream = stream or getattr(_redirect, 'stream', None) or sys.__stdout__
+        self._rows_written = 0
+        # One "%s" slot per field; every value is pre-encoded as JSON text.
+        self._template = '{' + ','.join(
+            f"{encode_basestring(field)}:%s" for field in self.fields) + '}'
+        if fmt == 'csv':
+            self._csv = csv.writer(self.stream, lineterminator='\n')
+            self._csv.writerow(self.fields)
+        elif fmt == 'json':
+            self.stream.write('[')
+
+    def write_columns(self, columns: Sequence[Sequence]):
+        """
+        Writes the rows formed by parallel columns, one per field.
+        """
+        if not columns or not columns[0]:
+            return
+        if self.fmt == 'csv':
+            self._csv.writerows(zip(*columns))
+            self._rows_written += len(columns[0])
+            return
+        encoded = []
+        for column in columns:
+            if isinstance(column[0], str):
+                encoded.append(list(map(encode_basestring, column)))
+            elif isinstance(column[0], int):
+                encoded.append(column)
+            else:
+                encoded.append(list(map(_json_value, column)))
+        records = map(self._template.__mod__, zip(*encoded))
+        if self.fmt == 'ndjson':
+            self.stream.write('\n'.join(records) + '\n')
+        else:
+            self.stream.write((',\n' if self._rows_written else '\n') + ',\n'.join(records))
+        self._rows_written += len(columns[0])
+
+    def write_rows(self, rows: Iterable[Sequence]):
+        rows = iter(rows)
+        while True:
+            block: List[Sequence] = list(islice(rows, self.BLOCK_ROWS))
+            if not block:
+                break
+            self.write_columns(list(zip(*block)))
+
+    def close(self):
+        if self.fmt == 'json':
+            self.stream.write('\n]\n' if self._rows_written else ']\n')
+        self.stream.flush()
+
+    def __enter__(self) -> 'RowWriter':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def contributor_fields(by: str, label_field: Optional[str] = None) -> tuple:
+    fields = CONTRIBUTOR_FIELDS + EXTRA_FIELDS.get(by, ())
+    return (label_field,) + fields if label_field else fields
+
+
+def export_contributors(writer: RowWriter, git_results, by: str, top_n: Optional[int],
+                        offset: int = 0, label: Optional[str] = None):
+    """
+    Writes one page of the ranking; with `label` set, such as a repository
+    or branch name, the writer's first field carries it on every row.
+    """
+    columns = git_results.ranked_columns(by=by, top_n=top_n, offset=offset)
+    if label is not None:
+        columns.insert(0, [label] * len(columns[0]))
+    writer.write_columns(columns)
+
+
+def export_owners(fmt: str, path_results, top_n: Optional[int], offset: int = 0):
+    columns = path_results.ranked_columns(by='i', top_n=top_n, offset=offset)
+    total = path_results.totals()['insertions']
+    shares = [round(insertions / total, 4) if total else 0.0 for insertions in columns[3]]
+    with RowWriter(fmt, OWNER_FIELDS) as writer:
+        writer.write_columns([columns[0], columns[1], columns[3], columns[4], shares])
+
+
+def export_author_query(fmt: str, git_results, query: str, since=None, until=None,
+                        bucket=None) -> bool:
+    """
+    Machine-readable counterpart of display_author_query: one row per
+    matching author, or one row per author and period with `bucket`.
+    Problems are reported on stderr so they never mix with the data.
+    """
+    matches = git_results.resolve_author(query)
+    if not matches:
+        sys.stderr.write(f"Author '{query}' not found in the repository.\n")
+        return False
+
+    windowed = None
+    if since is not None or until is not None:
+        windowed = git_results.window(since, until)
+    with RowWriter(fmt, TIMELINE_FIELDS if bucket else AUTHOR_FIELDS) as writer:
+        for author_result in matches:
+            author = author_result.author
+            if bucket:
+                writer.write_rows(
+                    (author, label, commits, insertions, deletions, insertions - deletions)
+                    for label, commits, insertions, deletions in
+                    git_results.get_timeline(author, bucket, since, until))
+                continue
+            if windowed is not None:
+                author_result = windowed.get_contribution(author)
+                if author_result is None:
+                    continue
+            writer.write_rows([(author, author_result.commits, author_result.insertions,
+                                author_result.deletions, author_result.net)])
+    return True
+
+
+def export_estimates(fmt: str, top_contributors: list):
+    """
+    Rows of a ranking estimated from a commit sample, rounded to whole
+    lines and commits.
+    """
+    with RowWriter(fmt, ESTIMATE_FIELDS) as writer:
+        writer.write_rows(
+            [rank, estimate.author] + [
+                round(value) for metric in ('commits', 'insertions', 'deletions', 'net')
+                for value in (getattr(estimate, metric), estimate.margins[metric])]
+            for rank, estimate in top_contributors)
+
+
+def export_repo_info(fmt: str, git_data, sample=None):
+    """
+    With a commit sample, the authors list is replaced by the sketched
+    count and its margin, and the dates come from the sample.
+    """
+    branches = list(git_data.branches)
+    languages = [{'language': language, 'bytes': size, 'files': files}
+                 for language, size, files in git_data.languages]
+    if fmt == 'csv':
+        branches = ';'.join(branches)
+        languages = ';'.join(f"{language}={size}/{files}"
+                             for language, size, files in git_data.languages)
+    if sample is not None:
+        count, margin = sample.distinct_authors()
+        with RowWriter(fmt, SAMPLED_INFO_FIELDS) as writer:
+            writer.write_rows([(str(git_data.repo_path), sample.first_commit_date,
+                                sample.last_commit_date, branches,
+                                git_data.predominant_language, languages,
+                                round(count), round(margin), len(sample))])
+        return
+    authors = list(git_data.authors)
+    if fmt == 'csv':
+        authors = ';'.join(authors)
+    with RowWriter(fmt, INFO_FIELDS) as writer:
+        writer.write_rows([(str(git_data.repo_path), git_data.creation_date,
+                            git_data.last_commit_date, branches,
+                            git_data.predominant_language, languages, authors)])
@@ -1,88 +1,866 @@
 # git.py
 
+import heapq
+import re
 import subprocess
 import sys
+import threading
+import time
+from datetime import datetime
 from pathlib import Path
-from collections import defaultdict
-from typing import List, Optional
+from array import array
+from itertools import accumulate, chain, repeat
+from operator import itemgetter, methodcaller, sub
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 from display import Prompts
-from colorama import Fore
+from cache import StatsCache
+from series import CommitSeries, bucket_label
+from author_index import AuthorIndex
+from path_trie import PathTrie
+from sketch import QuantileSketch
+from session import GitSession
+from languages import LanguageAnalyzer, map_extension_to_language
+from profiling import profiler
 
 
 class AuthorResults:
-    def __init__(self, author: str):
-        self.author: str = author
-        self.commits: int = 0
-        self.insertions: int = 0
-        self.deletions: int = 0
-        self.net: int = 0
-        self.rank: int = 0  
+    """
+    Lightweight view over one author's row in a GitResults store. Views are
+    created on demand and hold no counters of their own.
+    """
+    __slots__ = ('_store', '_author_id')
+
+    def __init__(self, store: 'GitResults', author_id: int):
+        self._store = store
+        self._author_id = author_id
+
+    @property
+    def author(self) -> str:
+        return self._store.author_names[self._author_id]
+
+    @property
+    def commits(self) -> int:
+        return self._store.commits[self._author_id]
+
+    @property
+    def insertions(self) -> int:
+        return self._store.insertions[self._author_id]
+
+    @property
+    def deletions(self) -> int:
+        return self._store.deletions[self._author_id]
+
+    @property
+    def owned(self) -> int:
+        return self._store.owned[self._author_id]
+
+    @property
+    def net(self) -> int:
+        return self.insertions - self.deletions
+
+    @property
+    def sizes(self) -> QuantileSketch:
+        """
+        Sketch of the author's commit sizes, in lines changed.
+        """
+        return self._store.sizes[self._author_id]
+
+    @property
+    def distinct_commits(self) -> int:
+        """
+        Commits that changed files, each counted once. `commits` counts one
+        per file changed instead.
+        """
+        return len(self.sizes)
+
+    @property
+    def median_size(self) -> int:
+        return self.sizes.quantile(0.5)
+
+    @property
+    def median_volume(self) -> int:
+        return self._store.median_volume(self._author_id)
 
     def add_commit(self, insertions: int, deletions: int):
-        self.commits += 1
-        self.insertions += insertions
-        self.deletions += deletions
-        self.net = self.insertions - self.deletions
+        self._store.add_contribution_by_id(self._author_id, insertions, deletions)
 
 
 class GitResults:
-    def __init__(self):
-        self.contributions = defaultdict(lambda: AuthorResults(author=""))
-
-    def add_contribution(self, author: str, insertions: int, deletions: int):
-        if not self.contributions[author].author:
-            self.contributions[author].author = author
-        self.contributions[author].add_commit(insertions, deletions)
-
-    def get_top_contributors(self, by: str = 'net', top_n: int = 10) -> List[AuthorResults]:
-        if by not in ['i', 'd', 'net']:
-            by = 'net'
-        metric = {'i': 'insertions', 'd': 'deletions', 'net': 'net'}[by]
-        sorted_contributors = sorted(
-            self.contributions.values(),
-            key=lambda x: getattr(x, metric),
-            reverse=True
-        )
-        for rank, contributor in enumerate(sorted_contributors[:top_n], start=1):
-            contributor.rank = rank
-        return sorted_contributors[:top_n]
-
-    def has_contributors(self) -> bool:
-        return bool(self.contributions)
+    """
+    Columnar store of per-author totals. Authors are interned to dense ids
+    and each counter is a typed array indexed by that id; net is derived
+    when it is needed.
+    """
+    RANK_METRICS = {'i': 'insertions', 'd': 'deletions', 'net': 'net', 'c': 'commits',
+                    'o': 'owned', 'm': 'median_volume'}
+
+    def __init__(self, path_depth: Optional[int] = None, path_nodes: Optional[int] = None,
+                 track_paths: bool = True):
+        self.author_ids: Dict[str, int] = {}
+        self.author_names: List[str] = []
+        self.commits = array('q')
+        self.insertions = array('q')
+        self.deletions = array('q')
+        # Lines of the current tree last touched by each author; filled by
+        # the blame engine on request rather than by the history walk.
+        self.owned = array('q')
+        # Per-author sketches of lines changed per commit, so the shape of
+        # an author's contributions is known in bounded memory.
+        self.sizes: List[QuantileSketch] = []
+        self.first_commit_time: Optional[int] = None
+        self.first_commit_date: str = ''
+        self.last_commit_time: Optional[int] = None
+        self.last_commit_date: str = ''
+        self.series = CommitSeries()
+        self.emails: Dict[str, List[int]] = {}
+        self.paths = PathTrie(path_depth, path_nodes, track_paths)
+        self._author_index: Optional[Tuple[int, int, AuthorIndex]] = None
+        self._version = 0
+        self._rankings: Dict[str, Tuple[int, List[int], bool]] = {}
+
+    def __len__(self) -> int:
+        return len(self.author_names)
+
+    def add_commit_date(self, timestamp: int, date: str):
+        if self.first_commit_time is None or timestamp <= self.first_commit_time:
+            self.first_commit_time = timestamp
+            self.first_commit_date = date
+        if self.last_commit_time is None or timestamp > self.last_commit_time:
+            self.last_commit_time = timestamp
+            self.last_commit_date = date
+
+    def add_commit(self, author_id: int, timestamp: int, date: str,
+                   insertions: int = 0, deletions: int = 0, files: int = 0):
+        self.add_commit_date(timestamp, date)
+        self.series.add_commit(timestamp, author_id, insertions, deletions, files)
+        if files:
+            self.add_contribution_by_id(author_id, insertions, deletions, commits=files)
+            self.sizes[author_id].add(insertions + deletions)
+
+    def add_commits(self, timestamps: array, author_ids: array, insertions: array,
+                    deletions: array, files: array):
+        """
+        Bulk form of add_commit for parallel per-commit columns; the caller
+        records the commit dates.
+        """
+        self.series.extend_columns(timestamps, author_ids, insertions, deletions, files)
+        commits, author_insertions, author_deletions = self.commits, self.insertions, self.deletions
+        sizes: Dict[int, List[int]] = {}
+        for author_id, commit_insertions, commit_deletions, commit_files in zip(
+                author_ids, insertions, deletions, files):
+            if commit_files:
+                commits[author_id] += commit_files
+                author_insertions[author_id] += commit_insertions
+                author_deletions[author_id] += commit_deletions
+                sizes.setdefault(author_id, []).append(commit_insertions + commit_deletions)
+        # Each author's sketch takes the block's sizes as one batch.
+        for author_id, values in sizes.items():
+            self.sizes[author_id].extend(values)
+        self._version += 1
+
+    def add_author(self, author: str) -> int:
+        author_id = self.author_ids.get(author)
+        if author_id is None:
+            author_id = len(self.author_names)
+            self.author_ids[author] = author_id
+            self.author_names.append(author)
+            self.commits.append(0)
+            self.insertions.append(0)
+            self.deletions.append(0)
+            self.owned.append(0)
+            self.sizes.append(QuantileSketch())
+            self._version += 1
+        return author_id
+
+    def add_email(self, author_id: int, email: str):
+        author_ids = self.emails.setdefault(email, [])
+        if author_id not in author_ids:
+            author_ids.append(author_id)
+
+    def author_index(self) -> AuthorIndex:
+        # Rebuilt only when authors or email addresses were added since the
+        # last lookup.
+        key = (len(self.author_names), len(self.emails))
+        if self._author_index is None or self._author_index[:2] != key:
+            self._author_index = (*key, AuthorIndex(self.author_names, self.emails))
+        return self._author_index[2]
+
+    def resolve_author(self, query: str) -> List[AuthorResults]:
+        """
+        The contributors a query refers to: the author with exactly that
+        name, otherwise every author whose name or email matches it when
+        case is ignored.
+        """
+        author_id = self.author_ids.get(query)
+        if author_id is not None:
+            return [AuthorResults(self, author_id)]
+        return [AuthorResults(self, author_id)
+                for author_id in self.author_index().lookup(query)]
+
+    def add_contribution_by_id(self, author_id: int, insertions: int, deletions: int,
+                               commits: int = 1):
+        self.commits[author_id] += commits
+        self.insertions[author_id] += insertions
+        self.deletions[author_id] += deletions
+        self._version += 1
+
+    def set_ownership(self, owned: Dict[str, int]):
+        for author_id in range(len(self)):
+            self.owned[author_id] = 0
+        for author, lines in owned.items():
+            self.owned[self.add_author(author)] = lines
+        self._version += 1
+
+    def has_ownership(self) -> bool:
+        return any(self.owned)
+
+    def net_column(self) -> array:
+        return array('q', map(sub, self.insertions, self.deletions))
+
+    def median_volume(self, author_id: int) -> int:
+        """
+        Distinct commits times median commit size: the volume an author's
+        typical commit adds up to, which a few huge commits such as vendored
+        imports cannot inflate.
+        """
+        sizes = self.sizes[author_id]
+        return len(sizes) * sizes.quantile(0.5)
+
+    def median_volume_column(self) -> array:
+        return array('q', map(self.median_volume, range(len(self))))
+
+    def totals(self) -> Dict[str, int]:
+        insertions = sum(self.insertions)
+        deletions = sum(self.deletions)
+        return {
+            'commits': sum(self.commits),
+            'insertions': insertions,
+            'deletions': deletions,
+            'net': insertions - deletions,
+        }
+
+    def get_top_contributors(self, by: str = 'net', top_n: Optional[int] = 10,
+                             offset: int = 0) -> List[Tuple[int, AuthorResults]]:
+        """
+        Returns `(rank, contributor)` pairs for one page of the ranking, or
+        for everyone from `offset` on when `top_n` is None. Ranks belong to
+        the query, so rankings by different metrics never overwrite each
+        other.
+        """
+        metric = self.RANK_METRICS.get(by, 'net')
+        needed = len(self) if top_n is None else offset + top_n
+        ranking = self._get_ranking(metric, needed)
+        return [(rank, AuthorResults(self, author_id)) for rank, author_id in
+                enumerate(ranking[offset:needed], start=offset + 1)]
+
+    def ranked_columns(self, by: str = 'net', top_n: Optional[int] = 10,
+                       offset: int = 0) -> List[list]:
+        """
+        The same page as get_top_contributors as parallel columns: rank,
+        author, commits, insertions, deletions and net, plus lines owned
+        when ranking by ownership or the median commit size and volume when
+        ranking by the latter. Reading whole columns is much cheaper than
+        building a view per contributor for long exports.
+        """
+        metric = self.RANK_METRICS.get(by, 'net')
+        needed = len(self) if top_n is None else offset + top_n
+        ids = self._get_ranking(metric, needed)[offset:needed]
+        insertions = self.insertions.tolist()
+        deletions = self.deletions.tolist()
+        columns = [
+            list(range(offset + 1, offset + len(ids) + 1)),
+            [self.author_names[author_id] for author_id in ids],
+            [self.commits[author_id] for author_id in ids],
+            [insertions[author_id] for author_id in ids],
+            [deletions[author_id] for author_id in ids],
+            [insertions[author_id] - deletions[author_id] for author_id in ids],
+        ]
+        if metric == 'owned':
+            columns.append([self.owned[author_id] for author_id in ids])
+        elif metric == 'median_volume':
+            columns.append([len(self.sizes[author_id]) for author_id in ids])
+            columns.append([self.sizes[author_id].quantile(0.5) for author_id in ids])
+            columns.append([self.median_volume(author_id) for author_id in ids])
+        return columns
+
+    def _get_ranking(self, metric: str, needed: int) -> List[int]:
+        # Each metric keeps the longest ranked prefix of author ids computed
+        # so far. It stays valid until a contribution changes, and a longer
+        # page only pays for a new selection when the prefix is too short.
+        cached = self._rankings.get(metric)
+        if cached:
+            version, ranking, complete = cached
+            if version == self._version and (complete or len(ranking) >= needed):
+                return ranking
+
+        if metric == 'net':
+            column = self.net_column()
+        elif metric == 'median_volume':
+            column = self.median_volume_column()
+        else:
+            column = getattr(self, metric)
+        key = column.__getitem__
+        if needed >= len(self):
+            ranking = sorted(range(len(self)), key=key, reverse=True)
+            complete = True
+        else:
+            ranking = heapq.nlargest(needed, range(len(self)), key=key)
+            complete = False
+        self._rankings[metric] = (self._version, ranking, complete)
+        return ranking
 
     def get_contribution(self, author: str) -> Optional[AuthorResults]:
-        return self.contributions.get(author, None)
+        author_id = self.author_ids.get(author)
+        if author_id is None:
+            return None
+        return AuthorResults(self, author_id)
+
+    def window(self, since: Optional[int] = None, until: Optional[int] = None) -> 'GitResults':
+        """
+        Totals for the commits with since <= author time < until, answered
+        from the per-commit series without running git again.
+        """
+        series = self.series
+        windowed = GitResults()
+        id_map: Dict[int, int] = {}
+        for row in series.rows_between(since, until):
+            author_id = series.author_ids[row]
+            windowed_id = id_map.get(author_id)
+            if windowed_id is None:
+                windowed_id = id_map[author_id] = windowed.add_author(
+                    self.author_names[author_id])
+            # The lifetime totals count one "commit" per numstat line, so
+            # the window does the same to stay comparable with them.
+            windowed.add_contribution_by_id(
+                windowed_id, series.insertions[row], series.deletions[row],
+                commits=series.files[row])
+            if series.files[row]:
+                windowed.sizes[windowed_id].add(series.insertions[row] + series.deletions[row])
+        return windowed
+
+    def get_timeline(self, author: str, period: str = 'month',
+                     since: Optional[int] = None,
+                     until: Optional[int] = None) -> List[Tuple[str, int, int, int]]:
+        """
+        Per-period `(label, commits, insertions, deletions)` rows for one
+        author, oldest period first.
+        """
+        author_id = self.author_ids.get(author)
+        if author_id is None:
+            return []
+        series = self.series
+        buckets: Dict[str, List[int]] = {}
+        for row in series.rows_between(since, until):
+            if series.author_ids[row] != author_id:
+                continue
+            label = bucket_label(series.timestamps[row], period)
+            bucket = buckets.setdefault(label, [0, 0, 0])
+            bucket[0] += series.files[row]
+            bucket[1] += series.insertions[row]
+            bucket[2] += series.deletions[row]
+        return [(label, *buckets[label]) for label in sorted(buckets)]
+
+    def path_results(self, path: str) -> Optional['GitResults']:
+        """
+        Totals for the changes under one directory, read from its node in
+        the path trie; None when the directory is not tracked.
+        """
+        node = self.paths.find(path)
+        if node is None:
+            return None
+        scoped = GitResults()
+        for author_id, (files, insertions, deletions) in sorted(
+                self.paths.totals[node].items()):
+            scoped.add_contribution_by_id(
+                scoped.add_author(self.author_names[author_id]),
+                insertions, deletions, commits=files)
+        return scoped
+
+    def merge(self, other: 'GitResults'):
+        """
+        Adds another set of results into this one. The operation is
+        associative, so shards can be combined in any grouping.
+        """
+        id_map = [self.add_author(author) for author in other.author_names]
+        for other_id, author_id in enumerate(id_map):
+            self.commits[author_id] += other.commits[other_id]
+            self.insertions[author_id] += other.insertions[other_id]
+            self.deletions[author_id] += other.deletions[other_id]
+            self.owned[author_id] += other.owned[other_id]
+            self.sizes[author_id].merge(other.sizes[other_id])
+        self.series.extend(other.series, id_map)
+        self.paths.merge(other.paths, id_map)
+        for email, other_ids in other.emails.items():
+            for other_id in other_ids:
+                self.add_email(id_map[other_id], email)
+        self._version += 1
+        if other.first_commit_time is not None:
+            self.add_commit_date(other.first_commit_time, other.first_commit_date)
+        if other.last_commit_time is not None:
+            self.add_commit_date(other.last_commit_time, other.last_commit_date)
+
+    def to_dict(self, with_series: bool = True) -> dict:
+        data = {
+            'authors': self.author_names,
+            'commits': self.commits.tolist(),
+            'insertions': self.insertions.tolist(),
+            'deletions': self.deletions.tolist(),
+            'sizes': [sizes.to_dict() for sizes in self.sizes],
+            'first_commit': [self.first_commit_time, self.first_commit_date],
+            'last_commit': [self.last_commit_time, self.last_commit_date],
+            'emails': self.emails,
+            'paths': self.paths.to_dict(),
+        }
+        if with_series:
+            data['series'] = self.series.to_dict()
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict, series: Optional[CommitSeries] = None) -> 'GitResults':
+        """
+        `series` stands in for the one in `data` when it was stored apart.
+        """
+        git_results = cls()
+        git_results.author_names = list(data['authors'])
+        git_results.author_ids = {
+            author: author_id for author_id, author in enumerate(git_results.author_names)
+        }
+        git_results.commits = array('q', data['commits'])
+        git_results.insertions = array('q', data['insertions'])
+        git_results.deletions = array('q', data['deletions'])
+        git_results.owned = array('q', bytes(8 * len(git_results.author_names)))
+        git_results.sizes = [QuantileSketch.from_dict(sizes) for sizes in data['sizes']]
+        git_results.first_commit_time, git_results.first_commit_date = data['first_commit']
+        git_results.last_commit_time, git_results.last_commit_date = data['last_commit']
+        git_results.series = series if series is not None else CommitSeries.from_dict(data['series'])
+        git_results.emails = data['emails']
+        git_results.paths = PathTrie.from_dict(data['paths'])
+        return git_results
+
+
+class WalkFilter:
+    """
+    Restrictions applied while the history is walked rather than afterwards,
+    so git only emits the commits and files that count. Dates are author
+    times with since <= time < until, matching GitResults.window. git can
+    only filter on committer time, so `since` is passed to it as a
+    superset (a commit is committed no earlier than it is authored) and
+    the parser drops what falls outside the window by author time.
+    """
+
+    def __init__(self, since: Optional[int] = None, until: Optional[int] = None,
+                 author: Optional[str] = None, no_merges: bool = False,
+                 include: Iterable[str] = (), exclude: Iterable[str] = ()):
+        self.since = since
+        self.until = until
+        self.author = author
+        self.no_merges = no_merges
+        self.include = list(include)
+        self.exclude = list(exclude)
+
+    def __bool__(self) -> bool:
+        return any(self.key())
+
+    def key(self) -> tuple:
+        return (self.since, self.until, self.author, self.no_merges,
+                tuple(self.include), tuple(self.exclude))
+
+    def log_options(self) -> List[str]:
+        options = []
+        if self.since is not None:
+            options.append(f'--since=@{self.since}')
+        if self.author:
+            # A substring of "Name <email>", so every author the query can
+            # resolve to is kept; resolve_author narrows it down.
+            options += ['--regexp-ignore-case', '--fixed-strings', f'--author={self.author}']
+        if self.no_merges:
+            options.append('--no-merges')
+        return options
+
+    def pathspecs(self) -> List[str]:
+        return self.include + [f':(exclude){path}' for path in self.exclude]
+
+    def describe(self) -> str:
+        parts = []
+        if self.since is not None:
+            parts.append(f"since {datetime.fromtimestamp(self.since):%Y-%m-%d}")
+        if self.until is not None:
+            parts.append(f"until {datetime.fromtimestamp(self.until):%Y-%m-%d}")
+        if self.author:
+            parts.append(f"author matching '{self.author}'")
+        if self.no_merges:
+            parts.append("no merges")
+        if self.include:
+            parts.append(f"only {', '.join(self.include)}")
+        if self.exclude:
+            parts.append(f"excluding {', '.join(self.exclude)}")
+        return '; '.join(parts) or 'none'
+
+
+FIRST = itemgetter(0)
+SECOND = itemgetter(1)
+THIRD = itemgetter(2)
+COUNT_TABS = methodcaller('count', b'\t')
+AFTER_LAST_LINE = methodcaller('rpartition', b'\n')
+BEFORE_FIRST_LINE = methodcaller('partition', b'\n')
+
+
+class NumstatParser:
+    """
+    Bulk parser for the numstat log. Output is fed in large byte chunks and
+    every complete run of commit records is handled as one block: record
+    and field boundaries are found with whole-block bytes and regex
+    operations, the numeric columns are converted in single passes, and the
+    per-commit sums are added to the results as whole columns.
+    """
+    HEADER = re.compile(rb'\x1e([^\x1f\n]*)\x1f([^\x1f\n]*)\x1f(\d+)\x1f([^\n]*)')
+    # Binary files show up as "-\t-\t<path>". git always quotes paths that
+    # contain tabs or newlines, so this can only appear at a line start.
+    BINARY_COUNTS = b'-\t-\t'
+
+    def __init__(self, git_results: GitResults, since: Optional[int] = None,
+                 until: Optional[int] = None):
+        self.git_results = git_results
+        self.since = since
+        self.until = until
+        self._author_ids: Dict[bytes, int] = {}
+        self._identities: Set[Tuple[bytes, bytes]] = set()
+        self._pending: List[bytes] = []
+
+    def feed(self, chunk: bytes):
+        cut = chunk.rfind(b'\x1e')
+        if cut < 0:
+            self._pending.append(chunk)
+            return
+        # Everything before the last record start is complete; that record
+        # may continue in the next chunk.
+        self._pending.append(chunk[:cut])
+        block = b''.join(self._pending)
+        self._pending = [chunk[cut:]]
+        self._add_block(block)
+
+    def close(self):
+        self._add_block(b''.join(self._pending))
+        self._pending = []
+
+    def _add_block(self, block: bytes):
+        if self.since is not None or self.until is not None:
+            block = self._in_window(block)
+        headers = self.HEADER.findall(block)
+        if not headers:
+            return
+        git_results = self.git_results
+
+        authors = list(map(FIRST, headers))
+        known_ids = self._author_ids
+        for author in authors:
+            if author not in known_ids:
+                known_ids[author] = git_results.add_author(
+                    author.decode('utf-8', errors='replace'))
+        author_ids = array('l', map(known_ids.__getitem__, authors))
+        timestamps = array('q', map(int, map(THIRD, headers)))
+
+        identities = set(zip(authors, map(SECOND, headers)))
+        for author, email in identities - self._identities:
+            git_results.add_email(known_ids[author], email.decode('utf-8', errors='replace'))
+        self._identities |= identities
+
+        if any(b'\t' in author or b'\t' in email for author, email in self._identities):
+            # Keep the tab arithmetic below valid for unusual identities.
+            block = self.HEADER.sub(b'\x1e', block)
+        block = block.replace(self.BINARY_COUNTS, b'0\t0\t')
+
+        # Each numstat line is "<ins>\t<del>\t<path>\n", so a commit's file
+        # count is its tab count halved. Splitting the whole block on tabs
+        # leaves every deletion count at an odd index and every insertion
+        # count right after the last newline of the element before it.
+        # The path of each line is then what precedes the first newline of
+        # the element after its deletion count.
+        files = array('l', [tabs // 2 for tabs in map(COUNT_TABS, block.split(b'\x1e')[1:])])
+        columns = block.split(b'\t')
+        boundaries = list(accumulate(files, initial=0))
+        file_insertions = list(map(int, map(THIRD, map(AFTER_LAST_LINE, columns[0:-1:2]))))
+        file_deletions = list(map(int, columns[1::2]))
+        insertions = array('q', self._segment_sums(file_insertions, boundaries))
+        deletions = array('q', self._segment_sums(file_deletions, boundaries))
+
+        git_results.add_commits(timestamps, author_ids, insertions, deletions, files)
+        profiler.count('commits_parsed', len(headers))
+        profiler.count('numstat_lines_parsed', len(file_deletions))
+        if git_results.paths.enabled:
+            git_results.paths.add_files(
+                map(FIRST, map(BEFORE_FIRST_LINE, columns[2::2])),
+                chain.from_iterable(map(repeat, author_ids, files)),
+                file_insertions, file_deletions)
+
+        # Same tie-breaking as add_commit_date applied row by row: the last
+        # of several oldest commits and the first of several newest.
+        count = len(headers)
+        oldest = min(reversed(range(count)), key=timestamps.__getitem__)
+        newest = max(range(count), key=timestamps.__getitem__)
+        for row in (oldest, newest):
+            git_results.add_commit_date(
+                timestamps[row], headers[row][3].decode('utf-8', errors='replace'))
+
+    def _in_window(self, block: bytes) -> bytes:
+        # The author time is the third header field of each record.
+        since = self.since if self.since is not None else -sys.maxsize
+        until = self.until if self.until is not None else sys.maxsize
+        records = block.split(b'\x1e')
+        kept = [record for record in records[1:]
+                if since <= int(record.split(b'\x1f', 3)[2]) < until]
+        return b''.join(b'\x1e' + record for record in kept)
+
+    @staticmethod
+    def _segment_sums(values: Iterable[int], boundaries: List[int]) -> List[int]:
+        prefix = list(accumulate(values, initial=0))
+        ends = map(prefix.__getitem__, boundaries[1:])
+        starts = map(prefix.__getitem__, boundaries)
+        return list(map(sub, ends, starts))
+
+
+class CachedWalk:
+    """
+    Works out which part of the history still has to be walked for a
+    repository. `git_results` starts from the cached totals when the cached
+    head is still an ancestor of HEAD and, with `track_paths`, its path trie
+    was built with the same limits; `revision` is the range left to walk,
+    or None when the cache is already current. Without `track_paths` a
+    cached trie is kept up to date but no new one is built.
+    """
+
+    def __init__(self, repo_path: Path, use_cache: bool = True,
+                 path_depth: Optional[int] = None, path_nodes: Optional[int] = None,
+                 track_paths: bool = True):
+        self.repo_path = repo_path
+        self.head = GitUtils.get_head_commit(repo_path)
+        self.cache = StatsCache(repo_path) if use_cache else None
+        self.git_results = GitResults(path_depth, path_nodes, track_paths)
+        self.revision: Optional[str] = self.head
+
+        cached = self.cache.load() if self.cache else None
+        if cached and track_paths:
+            paths = cached['results']['paths']
+            if not paths['enabled'] or paths['limits'] != [path_depth, path_nodes]:
+                cached = None
+        # Whether git_results continues the cached results, whose series
+        # then only needs the new rows appended.
+        self.extends_cache = False
+        if cached:
+            cached_head = cached['head']
+            if cached_head == self.head:
+                self.git_results = GitResults.from_dict(cached['results'], cached['series'])
+                self.revision = None
+            elif GitUtils.is_ancestor(repo_path, cached_head, self.head):
+                self.git_results = GitResults.from_dict(cached['results'], cached['series'])
+                self.revision = f"{cached_head}..{self.head}"
+                self.extends_cache = True
+
+    def save(self):
+        if self.cache and self.revision:
+            self.cache.save(self.head, self.git_results.to_dict(with_series=False),
+                            self.git_results.series, appended=self.extends_cache)
+
+
+class LoadCancelled(Exception):
+    pass
+
+
+class LoadProgress:
+    """
+    State shared between a load running in a background thread and the
+    thread reading its partial results. The loader holds `lock` while it
+    changes the results, reports how many commits it has read and checks
+    for cancellation between chunks.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.commits = 0
+        self.started = time.monotonic()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def check_cancelled(self):
+        if self._cancelled.is_set():
+            raise LoadCancelled()
+
+    def rate(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.commits / elapsed if elapsed > 0 else 0.0
 
 
 class GitData:
-    def __init__(self, repo_path: Path):
+    """
+    What the commands know about one repository. Each field is read from
+    git the first time it is asked for and kept: the contributor totals
+    come from the numstat walk, while authors and the first and last commit
+    dates come from a plain `git log` until the walk has run, so a query
+    only pays for the git work its answer needs. `fetch_all_data` loads
+    everything at once.
+
+    With `autoload` off the fields never load themselves; the caller runs
+    `fetch_all_data`, typically in a background thread, and readers see
+    whatever has been loaded so far.
+    """
+
+    def __init__(self, repo_path: Path, use_cache: bool = True, jobs: int = 1,
+                 progress: Optional[LoadProgress] = None, autoload: bool = True,
+                 path_depth: Optional[int] = None, path_nodes: Optional[int] = None,
+                 walk_filter: Optional[WalkFilter] = None, track_paths: bool = True):
         self.repo_path = repo_path
-        self.authors: List[str] = []
-        self.creation_date: str = ''
-        self.branches: List[str] = []
-        self.last_commit_date: str = ''
-        self.predominant_language: str = ''
-        self.git_results = GitResults()
-        self.fetch_all_data()
+        self.use_cache = use_cache
+        self.jobs = jobs
+        self.walk_filter = walk_filter
+        self.path_depth = path_depth
+        self.path_nodes = path_nodes
+        # Off when no directory will be asked about; see PathTrie.
+        self.track_paths = track_paths
+        self.progress = progress
+        self.autoload = autoload
+        # The commit the results were read up to, once they are loaded.
+        self.head: Optional[str] = None
+        self._git_results: Optional[GitResults] = None
+        # (authors, creation date, last commit date)
+        self._summary: Optional[Tuple[List[str], str, str]] = None
+        self._branches: Optional[List[str]] = None
+        # (language, bytes, files), largest first.
+        self._languages: Optional[List[Tuple[str, int, int]]] = None
+
+    @property
+    def git_results(self) -> GitResults:
+        if self._git_results is None:
+            if not self.autoload:
+                return GitResults(self.path_depth, self.path_nodes, self.track_paths)
+            self.load_git_results()
+        return self._git_results
+
+    @property
+    def authors(self) -> List[str]:
+        return self._load_summary()[0]
+
+    @property
+    def creation_date(self) -> str:
+        return self._load_summary()[1]
+
+    @property
+    def last_commit_date(self) -> str:
+        return self._load_summary()[2]
+
+    @property
+    def branches(self) -> List[str]:
+        if self._branches is None:
+            if not self.autoload:
+                return []
+            self._branches = GitUtils.get_branches(self.repo_path)
+        return self._branches
+
+    @property
+    def languages(self) -> List[Tuple[str, int, int]]:
+        if self._languages is None:
+            if not self.autoload:
+                return []
+            self._languages = GitUtils.get_language_breakdown(self.repo_path, self.use_cache)
+        return self._languages
+
+    @property
+    def predominant_language(self) -> str:
+        languages = self.languages
+        return languages[0][0] if languages else "Unknown"
+
+    def _load_summary(self) -> Tuple[List[str], str, str]:
+        if self._summary is None:
+            # A filtered walk changes which authors and dates count, so
+            # only the walk itself can answer for it.
+            if self._git_results is not None or self.walk_filter or not self.autoload:
+                self.refresh_summary()
+            else:
+                self._summary = GitUtils.get_history_summary(self.repo_path)
+        return self._summary
 
     def fetch_all_data(self):
-        self.authors = GitUtils.get_authors(self.repo_path)
-        self.creation_date = GitUtils.get_creation_date(self.repo_path)
-        self.branches = GitUtils.get_branches(self.repo_path)
-        self.last_commit_date = GitUtils.get_last_commit_date(self.repo_path)
-        self.predominant_language = GitUtils.get_predominant_language(
-            self.repo_path)
-        git_output = GitUtils.fetch_git_data(self.repo_path)
-        GitUtils.resolve_git_output(git_output, self.git_results)
+        """
+        Authors and first/last commit dates come out of the single numstat
+        walk; the ref and tree queries do not touch history and run
+        alongside it.
+        """
+        # Imported here so that queries which never load everything at once
+        # do not pay for importing the thread pool.
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=2) as executor, profiler.phase('fetch_all_data'):
+            branches = executor.submit(GitUtils.get_branches, self.repo_path)
+            languages = executor.submit(
+                GitUtils.get_language_breakdown, self.repo_path, self.use_cache)
+            self.load_git_results()
+            with profiler.phase('metadata_wait'):
+                self._branches = branches.result()
+                self._languages = languages.result()
+        self.refresh_summary()
 
-    def create_git_results(self) -> GitResults:
-        return self.git_results
+    def refresh_summary(self):
+        """
+        Copies the summary fields from the loaded results, which may still
+        be loading.
+        """
+        git_results = self.git_results
+        self._summary = (list(git_results.author_names), git_results.first_commit_date,
+                         git_results.last_commit_date)
+
+    def load_git_results(self):
+        """
+        Folds only the commits made since the cached head into the cached
+        totals; the cache is rebuilt when that head is no longer an ancestor
+        of HEAD (after a rebase or force-push). A filtered walk holds only
+        part of the history, so it is neither read from nor saved to the
+        cache.
+        """
+        walk_filter = self.walk_filter
+        with profiler.phase('cache_load'):
+            walk = CachedWalk(self.repo_path, self.use_cache and not walk_filter,
+                              self.path_depth, self.path_nodes, self.track_paths)
+        self.head = walk.head
+        self._git_results = walk.git_results
+        if walk.revision is not None:
+            with profiler.phase('walk'):
+                if self.jobs > 1:
+                    GitUtils.walk_history_parallel(
+                        self.repo_path, self._git_results, walk.revision, self.jobs,
+                        self.progress, walk_filter)
+                else:
+                    GitUtils.resolve_git_output(
+                        GitUtils.stream_git_data(self.repo_path, revision=walk.revision,
+                                                 walk_filter=walk_filter),
+                        self._git_results, self.progress, walk_filter)
+            with profiler.phase('cache_save'):
+                walk.save()
+        profiler.note('authors_seen', len(self._git_results))
 
-    def create_author_results(self) -> GitResults:
-        return self.git_results
+
+def _walk_shard(repo_path: Path, commits: List[str],
+                path_options: Tuple[Optional[int], Optional[int], bool],
+                walk_filter: Optional[WalkFilter] = None) -> dict:
+    # Runs in a worker process; results travel back as a plain dict of
+    # columns, which pickles far more compactly than the store itself.
+    # `path_options` are the GitResults path-trie arguments.
+    shard_results = GitResults(*path_options)
+    GitUtils.resolve_git_output(
+        GitUtils.stream_git_data(repo_path, commits=commits, walk_filter=walk_filter),
+        shard_results, walk_filter=walk_filter)
+    return shard_results.to_dict()
 
 
 class GitUtils:
+    # Each commit record starts with a header line that cannot be mistaken
+    # for a numstat line: RS, then author name, author email, unix time and
+    # display date separated by US. Names and emails go through .mailmap,
+    # as git blame's do, so churn and ownership rows name the same people.
+    COMMIT_HEADER_FORMAT = '%x1e%aN%x1f%aE%x1f%at%x1f%ad'
+    SHARDS_PER_JOB = 4
+    CHUNK_SIZE = 1 << 20
+    _git_installed = False
+
     @staticmethod
     def validate_git(repo_path: Path):
         GitUtils.check_git_installed()
@@ -90,16 +868,19 @@ class GitUtils:
 
     @staticmethod
     def check_git_installed():
+        # git cannot disappear during a session, so it is looked up once.
+        if GitUtils._git_installed:
+            return
         try:
-            result = subprocess.run(
+            result = profiler.run(
                 ['git', '--version'],
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True,
-                shell=True 
+                text=True
             )
             if result.returncode != 0:
                 raise FileNotFoundError
+            GitUtils._git_installed = True
         except FileNotFoundError:
             Prompts.error_prompt(
                 "Git is not installed or not found in PATH. Please install Git from https://git-scm.com/downloads and ensure it's added to your system's PATH."
@@ -108,226 +889,423 @@ class GitUtils:
 
     @staticmethod
     def validate_git_repository(repo_path: Path):
-        git_dir = repo_path / '.git'
-        if not git_dir.is_dir():
+        if not GitUtils.is_work_tree(repo_path):
             Prompts.error_prompt(
                 f"No .git directory found in the specified path: {repo_path}"
             )
             sys.exit(1)
 
     @staticmethod
-    def fetch_git_data(repo_path: Path, author: Optional[str] = None) -> str:
+    def is_work_tree(path: Path) -> bool:
+        """
+        Whether `path` is the top of a work tree. `.git` is usually the
+        repository itself; in submodules and linked worktrees it is a file
+        whose `gitdir:` line points at the repository instead.
+        """
+        git_dir = path / '.git'
+        if git_dir.is_dir():
+            return True
+        try:
+            with open(git_dir, 'r', encoding='utf-8') as git_file:
+                line = git_file.readline()
+        except (OSError, UnicodeDecodeError):
+            return False
+        if not line.startswith('gitdir:'):
+            return False
+        # Relative targets are relative to the work tree.
+        return (path / line[len('gitdir:'):].strip()).is_dir()
+
+    @staticmethod
+    def list_submodules(repo_path: Path) -> Tuple[List[Path], List[Path]]:
+        """
+        `(checked out, missing)` submodule work trees of `repo_path`, nested
+        ones included and each listed before its own submodules. Paths come
+        from `.gitmodules`, so one `git config` per level lists them all
+        without starting git in every submodule; submodules that were never
+        initialized have no work tree and are returned as missing.
+        """
+        checked_out: List[Path] = []
+        missing: List[Path] = []
+        pending = [repo_path]
+        while pending:
+            superproject = pending.pop()
+            if superproject != repo_path:
+                checked_out.append(superproject)
+            if not (superproject / '.gitmodules').is_file():
+                continue
+            try:
+                result = profiler.run(
+                    ['git', 'config', '--file', '.gitmodules', '-z',
+                     '--get-regexp', r'^submodule\..*\.path$'],
+                    cwd=str(superproject),
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    encoding='utf-8',
+                    errors='surrogateescape'
+                )
+            except FileNotFoundError:
+                Prompts.error_prompt("Git is not installed or not found in PATH.")
+                sys.exit(1)
+            # Exit status 1 means no submodule has a path.
+            if result.returncode not in (0, 1):
+                Prompts.error_prompt(f"Git error: {result.stderr.strip()}")
+                sys.exit(1)
+            found = []
+            for entry in result.stdout.split('\0'):
+                if not entry:
+                    continue
+                # With -z each entry is the key and the value on two lines.
+                submodule = superproject / entry.split('\n', 1)[1]
+                if GitUtils.is_work_tree(submodule):
+                    found.append(submodule)
+                else:
+                    missing.append(submodule)
+            pending.extend(reversed(found))
+        return checked_out, missing
+
+    @staticmethod
+    def build_log_command(author: Optional[str] = None, revision: Optional[str] = None,
+                          from_stdin: bool = False,
+                          walk_filter: Optional[WalkFilter] = None) -> List[str]:
+        cmd = ['git', 'log', f'--pretty=format:{GitUtils.COMMIT_HEADER_FORMAT}',
+               '--numstat']
         if author:
-            cmd = ['git', 'log', '--author', author,
-                   '--pretty=format:%an', '--numstat']
+            cmd[2:2] = ['--author', author]
+        if from_stdin:
+            # The commits were chosen by a filtered rev-list already; only
+            # the pathspecs still apply, to the numstat lines.
+            cmd += ['--no-walk=unsorted', '--stdin']
         else:
-            cmd = ['git', 'log', '--pretty=format:%an', '--numstat']
+            if walk_filter:
+                cmd += walk_filter.log_options()
+            if revision:
+                cmd.append(revision)
+        if walk_filter and walk_filter.pathspecs():
+            cmd += ['--', *walk_filter.pathspecs()]
+        return cmd
+
+    @staticmethod
+    def stream_git_data(repo_path: Path, author: Optional[str] = None,
+                        revision: Optional[str] = None,
+                        commits: Optional[List[str]] = None,
+                        walk_filter: Optional[WalkFilter] = None) -> Iterator[bytes]:
+        """
+        Yields the numstat log in raw chunks while git is still walking the
+        history, so memory use does not grow with the size of the log.
+        When `commits` is given only those commits are shown, in that order.
+        """
+        cmd = GitUtils.build_log_command(author, revision, commits is not None, walk_filter)
 
         try:
-            result = subprocess.run(
+            process = subprocess.Popen(
                 cmd,
                 cwd=str(repo_path),
+                stdin=subprocess.PIPE if commits is not None else subprocess.DEVNULL,
                 stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                shell=True
+                stderr=subprocess.PIPE
             )
-            if result.returncode != 0:
-                Prompts.error_prompt(f"Git error: {result.stderr.strip()}")
-                sys.exit(1)
-            return result.stdout
         except FileNotFoundError:
             Prompts.error_prompt(
                 "Git is not installed or not found in PATH."
             )
             sys.exit(1)
 
-    @staticmethod
-    def resolve_git_output(git_output: str, git_results: GitResults):
-        current_author = None
-
-        for line in git_output.split('\n'):
-            if not line.strip():
-                continue
-            if '\t' not in line:
-                current_author = line.strip()
-                if current_author not in git_results.contributions:
-                    git_results.contributions[current_author] = AuthorResults(
-                        author=current_author)
-            else:
-                if current_author is None:
-                    continue
-                parts = line.split('\t')
-                if len(parts) < 3:
-                    continue
-                insert, delete, _ = parts
-                try:
-                    insert = int(insert) if insert.isdigit() else 0
-                    delete = int(delete) if delete.isdigit() else 0
-                except ValueError:
-                    insert = 0
-                    delete = 0
-                git_results.add_contribution(current_author, insert, delete)
+        started = time.perf_counter()
+        waited = 0.0
+        bytes_read = 0
+        with process:
+            if commits is not None:
+                # git reads the whole revision list before it prints anything,
+                # so writing it up front cannot dead-lock against stdout.
+                process.stdin.write(('\n'.join(commits) + '\n').encode('ascii'))
+                process.stdin.close()
+            while True:
+                if profiler.enabled:
+                    read_started = time.perf_counter()
+                    chunk = process.stdout.read1(GitUtils.CHUNK_SIZE)
+                    waited += time.perf_counter() - read_started
+                    bytes_read += len(chunk)
+                else:
+                    chunk = process.stdout.read1(GitUtils.CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+            stderr = process.stderr.read().decode('utf-8', errors='replace')
+            profiler.record_git(cmd, started, bytes_read, waited)
+            if process.wait() != 0:
+                Prompts.error_prompt(f"Git error: {stderr.strip()}")
+                sys.exit(1)
 
     @staticmethod
-    def get_authors(repo_path: Path) -> List[str]:
+    def list_commits(repo_path: Path, revision: str,
+                     walk_filter: Optional[WalkFilter] = None) -> List[str]:
+        # git log rather than rev-list, whose --author ignores .mailmap.
+        cmd = ['git', 'log', '--format=%H', revision]
+        if walk_filter:
+            cmd[2:2] = walk_filter.log_options()
+            if walk_filter.pathspecs():
+                cmd += ['--', *walk_filter.pathspecs()]
         try:
-            result = subprocess.run(
-                ['git', 'log', '--pretty=format:%an'],
+            result = profiler.run(
+                cmd,
                 cwd=str(repo_path),
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True,
-                shell=True
+                text=True
             )
             if result.returncode != 0:
                 Prompts.error_prompt(f"Git error: {result.stderr.strip()}")
                 sys.exit(1)
-            authors = list(set(result.stdout.strip().split('\n')))
-            return authors
+            return result.stdout.split()
         except FileNotFoundError:
             Prompts.error_prompt("Git is not installed or not found in PATH.")
             sys.exit(1)
 
     @staticmethod
-    def get_creation_date(repo_path: Path) -> str:
+    def list_branch_refs(repo_path: Path) -> List[Tuple[str, str]]:
+        """
+        `(name, commit id)` for every local and remote branch, the same set
+        `get_branches` lists. Symbolic refs such as origin/HEAD are skipped
+        because they only repeat another branch.
+        """
         try:
-            result = subprocess.run(
-                ['git', 'log', '--reverse', '--pretty=format:%ad', '-n', '1'],
+            result = profiler.run(
+                ['git', 'for-each-ref',
+                 '--format=%(objectname)%09%(objecttype)%09%(symref)%09%(refname:short)',
+                 'refs/heads', 'refs/remotes'],
                 cwd=str(repo_path),
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True,
-                shell=True
+                text=True
             )
             if result.returncode != 0:
                 Prompts.error_prompt(f"Git error: {result.stderr.strip()}")
                 sys.exit(1)
-            return result.stdout.strip()
         except FileNotFoundError:
             Prompts.error_prompt("Git is not installed or not found in PATH.")
             sys.exit(1)
+        refs = []
+        for line in result.stdout.splitlines():
+            oid, object_type, symref, name = line.split('\t', 3)
+            if object_type == 'commit' and not symref:
+                refs.append((name, oid))
+        return refs
 
     @staticmethod
-    def get_branches(repo_path: Path) -> List[str]:
+    def list_commit_parents(repo_path: Path, tips: List[str]) -> Iterator[List[str]]:
+        """
+        `[commit, parent, ...]` for every commit reachable from `tips`, in
+        topological order: each commit comes before all of its parents.
+        """
         try:
-            result = subprocess.run(
-                ['git', 'branch', '--all', '--no-color'],
+            result = profiler.run(
+                ['git', 'rev-list', '--topo-order', '--parents', '--stdin'],
                 cwd=str(repo_path),
+                input='\n'.join(tips) + '\n',
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True,
-                shell=True
+                text=True
             )
             if result.returncode != 0:
                 Prompts.error_prompt(f"Git error: {result.stderr.strip()}")
                 sys.exit(1)
-            branches = [line.strip().lstrip('* ').strip()
-                        for line in result.stdout.strip().split('\n') if line]
-            return branches
         except FileNotFoundError:
             Prompts.error_prompt("Git is not installed or not found in PATH.")
             sys.exit(1)
+        return map(str.split, result.stdout.splitlines())
+
+    @staticmethod
+    def walk_history_parallel(repo_path: Path, git_results: GitResults,
+                              revision: str, jobs: int,
+                              progress: Optional[LoadProgress] = None,
+                              walk_filter: Optional[WalkFilter] = None):
+        """
+        Splits the commits in `revision` into contiguous shards, walks each
+        shard in its own worker process and merges the partial results in
+        history order, which gives the same totals as the serial walk.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        commits = GitUtils.list_commits(repo_path, revision, walk_filter)
+        if not commits:
+            return
+        # A few shards per worker keeps the pool busy when one shard happens
+        # to contain much larger commits than the others.
+        shard_count = min(len(commits), jobs * GitUtils.SHARDS_PER_JOB)
+        shard_size = -(-len(commits) // shard_count)
+        shards = [commits[start:start + shard_size]
+                  for start in range(0, len(commits), shard_size)]
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            try:
+                for shard_data in executor.map(_walk_shard, repeat(repo_path), shards,
+                                               repeat(git_results.paths.options()),
+                                               repeat(walk_filter)):
+                    shard_results = GitResults.from_dict(shard_data)
+                    profiler.count('commits_parsed', len(shard_results.series))
+                    if progress is None:
+                        with profiler.phase('merge'):
+                            git_results.merge(shard_results)
+                        continue
+                    progress.check_cancelled()
+                    with progress.lock, profiler.phase('merge'):
+                        git_results.merge(shard_results)
+                    progress.commits += len(shard_results.series)
+            except LoadCancelled:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
 
     @staticmethod
-    def get_last_commit_date(repo_path: Path) -> str:
+    def session(repo_path: Path) -> GitSession:
+        return GitSession.for_repo(repo_path)
+
+    @staticmethod
+    def list_tree_blobs(repo_path: Path, revision: str = 'HEAD') -> List[Tuple[str, str, str]]:
+        """
+        `(mode, blob id, path)` for every file in the tree of `revision`,
+        read through the repository's cat-file session.
+        """
         try:
-            result = subprocess.run(
-                ['git', 'log', '-1', '--pretty=format:%ad'],
-                cwd=str(repo_path),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                shell=True
-            )
-            if result.returncode != 0:
-                Prompts.error_prompt(f"Git error: {result.stderr.strip()}")
+            session = GitUtils.session(repo_path)
+            tree = session.resolve(f"{revision}^{{tree}}")
+            if tree is None:
+                Prompts.error_prompt(f"Git error: '{revision}' does not name a tree.")
                 sys.exit(1)
-            return result.stdout.strip()
+            return list(session.walk_tree(tree[0]))
         except FileNotFoundError:
             Prompts.error_prompt("Git is not installed or not found in PATH.")
             sys.exit(1)
 
     @staticmethod
-    def get_predominant_language(repo_path: Path) -> str:
+    def get_head_commit(repo_path: Path) -> str:
         try:
-            result = subprocess.run(
-                ['git', 'ls-files'],
+            head = GitUtils.session(repo_path).resolve('HEAD')
+        except FileNotFoundError:
+            Prompts.error_prompt("Git is not installed or not found in PATH.")
+            sys.exit(1)
+        if head is None or head[1] != 'commit':
+            Prompts.error_prompt("Git error: HEAD does not point to a commit.")
+            sys.exit(1)
+        return head[0]
+
+    @staticmethod
+    def is_ancestor(repo_path: Path, ancestor: str, commit: str) -> bool:
+        try:
+            result = profiler.run(
+                ['git', 'merge-base', '--is-ancestor', ancestor, commit],
                 cwd=str(repo_path),
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True,
-                shell=True
+                text=True
             )
-            if result.returncode != 0:
-                Prompts.error_prompt(f"Git error: {result.stderr.strip()}")
-                sys.exit(1)
-            files = result.stdout.strip().split('\n')
-            language_counts = defaultdict(int)
-            for file in files:
-                extension = Path(file).suffix.lower()
-                language = GitUtils.map_extension_to_language(extension)
-                if language:
-                    language_counts[language] += 1
-            if not language_counts:
-                return "Unknown"
-            predominant_language = max(
-                language_counts, key=language_counts.get)
-            return predominant_language
+            # Exit status 1 means "not an ancestor"; anything else (such as
+            # an object that was garbage collected) also invalidates it.
+            return result.returncode == 0
         except FileNotFoundError:
             Prompts.error_prompt("Git is not installed or not found in PATH.")
             sys.exit(1)
 
     @staticmethod
-    def map_extension_to_language(extension: str) -> Optional[str]:
-        extension_mapping = {
-            '.py': 'Python',
-            '.js': 'JavaScript',
-            '.java': 'Java',
-            '.c': 'C',
-            '.cpp': 'C++',
-            '.cs': 'C#',
-            '.rb': 'Ruby',
-            '.go': 'Go',
-            '.php': 'PHP',
-            '.ts': 'TypeScript',
-            '.swift': 'Swift',
-            '.kt': 'Kotlin',
-            '.m': 'Objective-C',
-            '.rs': 'Rust',
-            '.scala': 'Scala',
-            '.pl': 'Perl',
-            '.sh': 'Shell',
-            '.html': 'HTML',
-            '.css': 'CSS',
-            '.json': 'JSON',
-            '.xml': 'XML',
-        }
-        return extension_mapping.get(extension, None)
+    def resolve_git_output(git_output: Union[str, bytes, Iterable[bytes]],
+                           git_results: GitResults,
+                           progress: Optional[LoadProgress] = None,
+                           walk_filter: Optional[WalkFilter] = None):
+        if isinstance(git_output, str):
+            git_output = git_output.encode('utf-8')
+        if isinstance(git_output, bytes):
+            git_output = (git_output,)
+
+        if walk_filter:
+            parser = NumstatParser(git_results, walk_filter.since, walk_filter.until)
+        else:
+            parser = NumstatParser(git_results)
+        if progress is None:
+            for chunk in git_output:
+                with profiler.phase('parse'):
+                    parser.feed(chunk)
+            with profiler.phase('parse'):
+                parser.close()
+            return
+
+        read_before = len(git_results.series)
+        try:
+            for chunk in git_output:
+                progress.check_cancelled()
+                with progress.lock, profiler.phase('parse'):
+                    parser.feed(chunk)
+                progress.commits = len(git_results.series) - read_before
+        finally:
+            # Closing the stream after a cancellation also stops git.
+            close = getattr(git_output, 'close', None)
+            if close is not None:
+                close()
+        with progress.lock, profiler.phase('parse'):
+            parser.close()
+        progress.commits = len(git_results.series) - read_before
 
     @staticmethod
-    def check_author_exists(repo_path: Path, author: str):
+    def get_history_summary(repo_path: Path) -> Tuple[List[str], str, str]:
         """
-        Checks if the specified author exists in the repository.
+        `(authors, creation date, last commit date)` from one `git log`
+        that reads commit headers only. Authors are listed newest first and
+        the dates are picked by author time, as the numstat walk does.
         """
         try:
-            result = subprocess.run(
-                ['git', 'log', '--author', author, '--pretty=oneline'],
+            result = profiler.run(
+                ['git', 'log', '--pretty=format:%at%x1f%ad%x1f%aN'],
                 cwd=str(repo_path),
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True,
-                shell=True
+                encoding='utf-8',
+                errors='replace'
+            )
+        except FileNotFoundError:
+            Prompts.error_prompt("Git is not installed or not found in PATH.")
+            sys.exit(1)
+        if result.returncode != 0:
+            Prompts.error_prompt(f"Git error: {result.stderr.strip()}")
+            sys.exit(1)
+
+        git_results = GitResults()
+        authors: Dict[str, None] = {}
+        for line in result.stdout.splitlines():
+            timestamp, date, author = line.split('\x1f', 2)
+            git_results.add_commit_date(int(timestamp), date)
+            authors[author] = None
+        return list(authors), git_results.first_commit_date, git_results.last_commit_date
+
+    @staticmethod
+    def get_branches(repo_path: Path) -> List[str]:
+        try:
+            result = profiler.run(
+                ['git', 'branch', '--all', '--no-color'],
+                cwd=str(repo_path),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True
             )
             if result.returncode != 0:
                 Prompts.error_prompt(f"Git error: {result.stderr.strip()}")
                 sys.exit(1)
-            if not result.stdout.strip():
-                Prompts.error_prompt(
-                    f"Author '{author}' not found in the repository.")
-                sys.exit(1)
+            branches = [line.strip().lstrip('* ').strip()
+                        for line in result.stdout.strip().split('\n') if line]
+            return branches
         except FileNotFoundError:
-            Prompts.error_prompt(
-                "Git is not installed or not found in PATH."
-            )
+            Prompts.error_prompt("Git is not installed or not found in PATH.")
             sys.exit(1)
+
+    @staticmethod
+    def get_predominant_language(repo_path: Path, use_cache: bool = True) -> str:
+        """
+        The language with the most bytes in the HEAD tree.
+        """
+        breakdown = GitUtils.get_language_breakdown(repo_path, use_cache)
+        return breakdown[0][0] if breakdown else "Unknown"
+
+    @staticmethod
+    def get_language_breakdown(repo_path: Path,
+                               use_cache: bool = True) -> List[Tuple[str, int, int]]:
+        return LanguageAnalyzer(repo_path, use_cache).breakdown()
+
+    @staticmethod
+    def map_extension_to_language(extension: str) -> Optional[str]:
+        return map_extension_to_language(extension)
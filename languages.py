@@ -0,0 +1,231 @@
+# languages.py
+
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from cache import StatsCache
+from display import Prompts
+from session import GitSession
+from profiling import profiler
+
+LANGUAGES_BY_EXTENSION = {
+    '.py': 'Python',
+    '.pyi': 'Python',
+    '.pyx': 'Cython',
+    '.ipynb': 'Jupyter Notebook',
+    '.js': 'JavaScript',
+    '.mjs': 'JavaScript',
+    '.cjs': 'JavaScript',
+    '.jsx': 'JavaScript',
+    '.ts': 'TypeScript',
+    '.tsx': 'TypeScript',
+    '.vue': 'Vue',
+    '.svelte': 'Svelte',
+    '.java': 'Java',
+    '.kt': 'Kotlin',
+    '.kts': 'Kotlin',
+    '.scala': 'Scala',
+    '.groovy': 'Groovy',
+    '.clj': 'Clojure',
+    '.c': 'C',
+    '.h': 'C',
+    '.cpp': 'C++',
+    '.cc': 'C++',
+    '.cxx': 'C++',
+    '.hpp': 'C++',
+    '.hh': 'C++',
+    '.hxx': 'C++',
+    '.cs': 'C#',
+    '.fs': 'F#',
+    '.vb': 'Visual Basic',
+    '.m': 'Objective-C',
+    '.mm': 'Objective-C++',
+    '.swift': 'Swift',
+    '.go': 'Go',
+    '.rs': 'Rust',
+    '.zig': 'Zig',
+    '.nim': 'Nim',
+    '.d': 'D',
+    '.rb': 'Ruby',
+    '.php': 'PHP',
+    '.pl': 'Perl',
+    '.pm': 'Perl',
+    '.lua': 'Lua',
+    '.r': 'R',
+    '.jl': 'Julia',
+    '.dart': 'Dart',
+    '.ex': 'Elixir',
+    '.exs': 'Elixir',
+    '.erl': 'Erlang',
+    '.hs': 'Haskell',
+    '.ml': 'OCaml',
+    '.sh': 'Shell',
+    '.bash': 'Shell',
+    '.zsh': 'Shell',
+    '.ps1': 'PowerShell',
+    '.sql': 'SQL',
+    '.html': 'HTML',
+    '.htm': 'HTML',
+    '.css': 'CSS',
+    '.scss': 'SCSS',
+    '.sass': 'Sass',
+    '.less': 'Less',
+    '.json': 'JSON',
+    '.xml': 'XML',
+    '.yml': 'YAML',
+    '.yaml': 'YAML',
+    '.toml': 'TOML',
+    '.md': 'Markdown',
+    '.rst': 'reStructuredText',
+    '.tex': 'TeX',
+    '.proto': 'Protocol Buffers',
+    '.tf': 'HCL',
+    '.cmake': 'CMake',
+    '.gradle': 'Gradle',
+}
+
+# Regular and executable files; symlinks and submodules are not counted.
+FILE_MODES = ('100644', '100755')
+
+# Per-tree totals: language -> [bytes, files].
+Totals = Dict[str, List[int]]
+
+
+def _add_totals(into: Totals, other: Totals):
+    for language, (size, files) in other.items():
+        row = into.setdefault(language, [0, 0])
+        row[0] += size
+        row[1] += files
+
+
+class LanguageAnalyzer:
+    """
+    Breaks a tree down by language, weighted by bytes as well as by files.
+    Totals are kept per tree object id: a cold run reads every blob size
+    from one `git ls-tree -r -t -l`, and later runs descend only into trees
+    whose id is not cached yet, so an unchanged subtree is never re-read.
+    The cache keeps the trees of the last analyzed root only.
+    """
+
+    def __init__(self, repo_path: Path, use_cache: bool = True):
+        self.repo_path = repo_path
+        self.cache = StatsCache(repo_path, name='languages') if use_cache else None
+        # tree id -> (totals, child tree ids)
+        self.trees: Dict[str, Tuple[Totals, List[str]]] = {}
+
+    def breakdown(self, revision: str = 'HEAD') -> List[Tuple[str, int, int]]:
+        """
+        `(language, bytes, files)` for each language in the tree of
+        `revision`, largest first; empty when there is no such tree.
+        """
+        session = GitSession.for_repo(self.repo_path)
+        try:
+            root = session.resolve(f"{revision}^{{tree}}")
+        except FileNotFoundError:
+            Prompts.error_prompt("Git is not installed or not found in PATH.")
+            sys.exit(1)
+        if root is None:
+            return []
+        root = root[0]
+
+        cached = self.cache.load() if self.cache else None
+        if cached:
+            self.trees = {oid: (totals, children)
+                          for oid, (totals, children) in cached['results'].items()}
+        if root not in self.trees:
+            if self.trees:
+                with profiler.phase('languages'):
+                    self._summarize(session, root)
+            else:
+                with profiler.phase('languages'):
+                    self._summarize_all(root)
+            if self.cache:
+                self.cache.save(root, self._reachable(root))
+
+        totals = self.trees[root][0]
+        return sorted(((language, size, files) for language, (size, files) in totals.items()),
+                      key=lambda row: (-row[1], -row[2], row[0]))
+
+    def _summarize(self, session: GitSession, tree_oid: str) -> Totals:
+        known = self.trees.get(tree_oid)
+        if known is not None:
+            return known[0]
+        profiler.count('language_trees_read')
+        totals: Totals = {}
+        children = []
+        blobs: List[Tuple[str, str]] = []
+        for mode, oid, name in session.read_tree(tree_oid):
+            if mode == '40000':
+                children.append(oid)
+                _add_totals(totals, self._summarize(session, oid))
+            elif mode in FILE_MODES:
+                language = map_extension_to_language(Path(name).suffix.lower())
+                if language:
+                    blobs.append((language, oid))
+        sizes = session.object_sizes([oid for _, oid in blobs])
+        for (language, _), size in zip(blobs, sizes):
+            row = totals.setdefault(language, [0, 0])
+            row[0] += size or 0
+            row[1] += 1
+        self.trees[tree_oid] = (totals, children)
+        return totals
+
+    def _summarize_all(self, root: str):
+        try:
+            result = profiler.run(
+                ['git', 'ls-tree', '-r', '-t', '-l', '-z', root],
+                cwd=str(self.repo_path),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+        except FileNotFoundError:
+            Prompts.error_prompt("Git is not installed or not found in PATH.")
+            sys.exit(1)
+        if result.returncode != 0:
+            Prompts.error_prompt(
+                f"Git error: {result.stderr.decode('utf-8', errors='replace').strip()}")
+            sys.exit(1)
+
+        # Directory path -> (tree id, direct totals, child directory paths).
+        directories: Dict[str, Tuple[str, Totals, List[str]]] = {'': (root, {}, [])}
+        for record in result.stdout.split(b'\0'):
+            if not record:
+                continue
+            info, _, path = record.partition(b'\t')
+            mode, object_type, oid, size = info.split()
+            path = path.decode('utf-8', errors='surrogateescape')
+            parent = path.rpartition('/')[0]
+            if object_type == b'tree':
+                directories[path] = (oid.decode('ascii'), {}, [])
+                directories[parent][2].append(path)
+            elif mode.decode('ascii') in FILE_MODES:
+                language = map_extension_to_language(Path(path).suffix.lower())
+                if language:
+                    row = directories[parent][1].setdefault(language, [0, 0])
+                    row[0] += int(size)
+                    row[1] += 1
+
+        # ls-tree lists a tree before its contents, so walking the listing
+        # backwards finishes every child before its parent.
+        for path in reversed(list(directories)):
+            tree_oid, totals, child_paths = directories[path]
+            for child in child_paths:
+                _add_totals(totals, self.trees[directories[child][0]][0])
+            self.trees[tree_oid] = (totals, [directories[child][0] for child in child_paths])
+
+    def _reachable(self, root: str) -> dict:
+        kept = {}
+        pending = [root]
+        while pending:
+            oid = pending.pop()
+            if oid in kept:
+                continue
+            totals, children = self.trees[oid]
+            kept[oid] = [totals, children]
+            pending.extend(children)
+        return kept
+
+
+def map_extension_to_language(extension: str) -> Optional[str]:
+    return LANGUAGES_BY_EXTENSION.get(extension)
@@ -1,16 +1,48 @@
 # main.py
 
 import argparse
+import os
 from pathlib import Path
-from git import GitUtils, GitResults, GitData
+from git import GitUtils, GitResults, GitData, WalkFilter
 from display import display_author_stats, display_top_contributors, display_repo_info
+from display import display_author_query, display_path_query, display_profile
+from display import display_branch_summary, display_estimated_contributors
 from display import Prompts
-from colorama import Fore
-from app import App
+from cache import StatsCache
+from session import GitSession
+from profiling import profiler
+from export import FORMATS, RowWriter, contributor_fields, export_contributors
+from export import AUTHOR_FIELDS, export_author_query, export_owners, export_repo_info
+from export import export_estimates
+from series import BUCKET_PERIODS, parse_date
 import sys
+from typing import TYPE_CHECKING, Callable, Optional
 
+# The interactive shell, the batch scheduler, the daemon and the blame and
+# branch engines pull in asyncio, process pools and socket servers; each is
+# imported where it is used so that a single query starts without them.
+if TYPE_CHECKING:
+    from batch import BatchRunner
 
-def set_app_args():
+
+def date_argument(value: str) -> int:
+    try:
+        return parse_date(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid date '{value}': use YYYY-MM-DD or an age such as 90d")
+
+
+def limit_argument(value: str):
+    if value == 'all':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid limit '{value}': use a number or 'all'")
+
+
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description='Analyze Git repository contributions by authors.'
     )
@@ -32,7 +64,13 @@ def set_app_args():
     group.add_argument(
         '-top', '--top_contributors',
         action='store_true',
-        help='Display top 10 contributors'
+        help='Display the top contributors (10 unless --limit is given)'
+    )
+
+    group.add_argument(
+        '--owners',
+        metavar='DIR',
+        help='Display who added the most lines under a directory of the repository'
     )
 
     group.add_argument(
@@ -44,15 +82,484 @@ def set_app_args():
     parser.add_argument(
         '-by', '--by',
         type=str,
-        choices=['i', 'd', 'net'],
+        choices=['i', 'd', 'net', 'c', 'o', 'm'],
         default='net',
-        help='Metric to rank top contributors by: -i for insertions, -d for deletions, -net for net contributions (default: net)'
+        help='Metric to rank top contributors by: -i for insertions, -d for deletions, -net for net contributions, -c for commits, -o for lines owned in the current tree, -m for distinct commits times median commit size (default: net)'
+    )
+
+    parser.add_argument(
+        '--limit',
+        type=limit_argument,
+        default=10,
+        help="Number of contributors shown by -top, or 'all' (default: 10)"
+    )
+
+    parser.add_argument(
+        '--format',
+        choices=FORMATS,
+        help='Write the results as NDJSON, CSV or a JSON array instead of colored tables'
+    )
+
+    parser.add_argument(
+        '--offset',
+        type=int,
+        default=0,
+        help='Number of ranked contributors skipped by -top before the page starts (default: 0)'
+    )
+
+    parser.add_argument(
+        '--since',
+        type=date_argument,
+        help='Only count commits authored on or after this date (YYYY-MM-DD or a relative age such as 90d, 12w, 6m)'
+    )
+
+    parser.add_argument(
+        '--until',
+        type=date_argument,
+        help='Only count commits authored before this date (same formats as --since)'
+    )
+
+    parser.add_argument(
+        '--no-merges',
+        action='store_true',
+        help='Leave merge commits out of the walk'
+    )
+
+    parser.add_argument(
+        '--include',
+        action='append',
+        default=[],
+        metavar='PATHSPEC',
+        help='Only count changes to files matching this pathspec (repeatable)'
+    )
+
+    parser.add_argument(
+        '--exclude',
+        action='append',
+        default=[],
+        metavar='PATHSPEC',
+        help='Skip changes to files matching this pathspec, such as vendored or generated directories (repeatable)'
+    )
+
+    parser.add_argument(
+        '--dir',
+        metavar='DIR',
+        help='With -top, only count changes under this directory of the repository'
+    )
+
+    parser.add_argument(
+        '--branches',
+        nargs='*',
+        metavar='REF',
+        help='With -top, analyze these refs (default: every local and remote branch) in one walk'
+    )
+
+    parser.add_argument(
+        '--branch-scope',
+        choices=['unique', 'reach'],
+        default='unique',
+        help='With --branches, rank each branch by the commits only it reaches, or by all it reaches (default: unique)'
+    )
+
+    parser.add_argument(
+        '--approx',
+        action='store_true',
+        help='With -top or -i, estimate from a sample of commits instead of reading the whole history'
+    )
+
+    parser.add_argument(
+        '--sample',
+        type=int,
+        default=2000,
+        metavar='COMMITS',
+        help='Number of commits --approx reads (default: 2000)'
+    )
+
+    parser.add_argument(
+        '--sample-mode',
+        choices=['stratified', 'uniform'],
+        default='stratified',
+        help='Draw the --approx sample evenly across time ranges, or uniformly (default: stratified)'
+    )
+
+    parser.add_argument(
+        '--path-depth',
+        type=int,
+        help='Keep directory statistics at most this many levels deep (default: unlimited)'
+    )
+
+    parser.add_argument(
+        '--path-nodes',
+        type=int,
+        help='Keep directory statistics for at most this many directories (default: unlimited)'
+    )
+
+    parser.add_argument(
+        '--bucket',
+        choices=BUCKET_PERIODS,
+        help='With -a/--author, also break the author\'s contributions down by week or month'
+    )
+
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=1,
+        help='Number of worker processes used to walk the history (default: 1)'
+    )
+
+    parser.add_argument(
+        '--batch',
+        nargs='+',
+        metavar='PATH',
+        help='Analyze several repositories, or every repository directly under a directory, concurrently'
+    )
+
+    parser.add_argument(
+        '--recursive',
+        action='store_true',
+        help='Also analyze every checked-out submodule, nested ones included, concurrently with the repository'
+    )
+
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=os.cpu_count() or 4,
+        help='Maximum number of repositories analyzed at the same time with --batch or --recursive (default: CPU count)'
+    )
+
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Print how long each phase and git call took, with peak memory use'
+    )
+
+    parser.add_argument(
+        '--profile-trace',
+        metavar='FILE',
+        type=Path,
+        help='Write the profile as a JSON trace (viewable in chrome://tracing) to FILE'
+    )
+
+    parser.add_argument(
+        '--cprofile',
+        metavar='PHASE',
+        help='Run one phase (such as parse, walk, blame or render) under cProfile'
     )
 
-    return parser.parse_args()
+    parser.add_argument(
+        '--cprofile-output',
+        metavar='FILE',
+        type=Path,
+        default=Path('git-measure.prof'),
+        help='Where --cprofile writes its statistics (default: git-measure.prof)'
+    )
+
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Ignore the cached statistics and re-read the full history'
+    )
+
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='Serve queries from a long-running process that keeps repositories loaded'
+    )
+
+    parser.add_argument(
+        '--connect',
+        action='store_true',
+        help='Send this query to a running --daemon instead of analyzing the repository here'
+    )
 
+    parser.add_argument(
+        '--socket',
+        metavar='PATH',
+        type=Path,
+        help='Unix socket used by --daemon and --connect (default: a per-user socket in the runtime directory)'
+    )
+
+    parser.add_argument(
+        '--memory-budget',
+        type=int,
+        default=1024,
+        metavar='MIB',
+        help='Approximate memory the daemon may use for loaded repositories before evicting the least recently used (default: 1024)'
+    )
+
+    return parser
+
+
+def set_app_args():
+    return build_parser().parse_args()
+
+
+def validate_paging(args):
+    if args.limit is not None and args.limit < 1 or args.offset < 0:
+        Prompts.error_prompt(
+            "Error: --limit must be at least 1 (or 'all') and --offset must not be negative.")
+        sys.exit(1)
+
+
+def validate_ownership(args):
+    if args.by != 'o':
+        return
+    if args.since is not None or args.until is not None or args.dir is not None or \
+            args.no_merges or args.include or args.exclude:
+        Prompts.error_prompt(
+            "Error: -by o ranks lines owned in the current tree and cannot be "
+            "combined with --since, --until, --dir, --no-merges, --include or --exclude.")
+        sys.exit(1)
+
+
+def validate_approx(args):
+    if not args.approx:
+        return
+    if not (args.top_contributors or args.info) or args.batch or args.recursive or \
+            args.dir is not None or args.branches is not None or args.by in ('o', 'm'):
+        Prompts.error_prompt(
+            "Error: --approx works with -top or -i and cannot be combined with --batch, "
+            "--recursive, --dir, --branches, -by o or -by m.")
+        sys.exit(1)
+    if args.sample < 2:
+        Prompts.error_prompt("Error: --sample must be at least 2.")
+        sys.exit(1)
+
+
+def build_walk_filter(args, repo_path: Optional[Path] = None) -> Optional[WalkFilter]:
+    """
+    Path and merge filters always go into the walk. Dates, and the author
+    of an author query, are answered from the cached full history when it
+    can be used, and are pushed into git only when the walk skips the cache
+    anyway. Given `repo_path`, an author query with no saved history reads
+    only that author's commits instead of walking everything.
+    """
+    author_query = bool(args.author) and not (
+        args.top_contributors or args.info or args.owners is not None)
+    skips_cache = args.no_merges or args.include or args.exclude or args.no_cache
+    if author_query and repo_path is not None and not skips_cache:
+        skips_cache = not StatsCache(repo_path).exists()
+    if not skips_cache:
+        return None
+    walk_filter = WalkFilter(args.since, args.until, args.author if author_query else None,
+                             args.no_merges, args.include, args.exclude)
+    return walk_filter if walk_filter else None
+
+
+def run_batch(args):
+    """
+    Runs --batch, and --recursive, which is a batch of one repository and
+    all of its submodules.
+    """
+    from batch import BatchRunner, discover_repositories
+    mode = '--batch' if args.batch else '--recursive'
+    if not args.batch and not args.path:
+        Prompts.error_prompt("Error: --recursive needs the -p/--path of the superproject.")
+        sys.exit(1)
+    roots = [Path(path).resolve() for path in args.batch or [args.path]]
+    if not args.batch:
+        GitUtils.validate_git(roots[0])
+    repo_paths = discover_repositories(roots)
+    if args.recursive:
+        expanded = []
+        for repo_path in repo_paths:
+            submodules, missing = GitUtils.list_submodules(repo_path)
+            for submodule in missing if not args.format else ():
+                Prompts.info_prompt(f"{submodule}: submodule is not checked out; skipped.")
+            expanded += [repo_path] + submodules
+        repo_paths = expanded
+    if not repo_paths:
+        Prompts.error_prompt("Error: No Git repositories found for --batch.")
+        sys.exit(1)
+    if args.concurrency < 1:
+        Prompts.error_prompt("Error: --concurrency must be at least 1.")
+        sys.exit(1)
+    if not (args.top_contributors or args.author):
+        Prompts.error_prompt(
+            f"No action specified. Use -a/--author or -top with {mode}."
+        )
+        sys.exit(1)
+
+    validate_paging(args)
+    validate_ownership(args)
+
+    GitUtils.check_git_installed()
+    runner = BatchRunner(repo_paths, concurrency=args.concurrency,
+                         use_cache=not args.no_cache, walk_filter=build_walk_filter(args))
+    runner.run()
+
+    for repo_path, error in runner.failures.items():
+        Prompts.error_prompt(f"{repo_path}: {error}")
+
+    by = args.by
+    for repo_path, git_results in runner.results.items():
+        if by == 'o':
+            from blame import BlameEngine
+            BlameEngine(repo_path, use_cache=not args.no_cache).apply(git_results)
+            GitSession.release(repo_path)
+        if args.since is not None or args.until is not None:
+            git_results = git_results.window(args.since, args.until)
+            runner.results[repo_path] = git_results
+
+    if args.format:
+        export_batch(args, runner)
+        return
+
+    base = Path(os.path.commonpath(runner.results)) if runner.results else None
+    for repo_path, git_results in runner.results.items():
+        # Submodules are named by their path in the superproject, which
+        # unlike their directory name is unique.
+        name = repo_path.name if repo_path == base else repo_path.relative_to(base)
+        if args.top_contributors:
+            Prompts.info_prompt(
+                f"{name}: Top Contributors Ranked by {by.upper()}:")
+            display_top_contributors(git_results.get_top_contributors(
+                by=by, top_n=args.limit, offset=args.offset), by)
+        else:
+            Prompts.info_prompt(f"{name}:")
+            display_batch_author(git_results, args.author)
+
+    leaderboard = runner.leaderboard()
+    scope = 'Organization-wide' if args.batch else 'All Repositories'
+    if args.top_contributors:
+        Prompts.info_prompt(
+            f"{scope} Top Contributors Ranked by {by.upper()}:")
+        display_top_contributors(leaderboard.get_top_contributors(
+            by=by, top_n=args.limit, offset=args.offset), by)
+    else:
+        Prompts.info_prompt(f"{scope}:")
+        display_batch_author(leaderboard, args.author)
+
+
+def display_batch_author(git_results: GitResults, query: str):
+    """
+    Resolves `query` like a single-repository author query. A repository
+    the author never committed to is expected in a batch, so no match
+    gets the plain no-contributions message rather than suggestions.
+    """
+    matches = git_results.resolve_author(query)
+    if not matches:
+        display_author_stats(None)
+    for author_result in matches:
+        if author_result.author != query:
+            Prompts.info_prompt(f"Showing results for '{author_result.author}'")
+        display_author_stats(author_result)
+
+
+def export_batch(args, runner: 'BatchRunner'):
+    """
+    Writes every repository's rows followed by the organization-wide rows,
+    which carry an empty repository field.
+    """
+    if args.top_contributors:
+        with RowWriter(args.format, contributor_fields(args.by, 'repository')) as writer:
+            for repo_path, git_results in runner.results.items():
+                export_contributors(writer, git_results, args.by, args.limit,
+                                    args.offset, str(repo_path))
+            export_contributors(writer, runner.leaderboard(), args.by, args.limit,
+                                args.offset, '')
+        return
+    with RowWriter(args.format, ('repository',) + AUTHOR_FIELDS) as writer:
+        results = list(runner.results.items()) + [(None, runner.leaderboard())]
+        for repo_path, git_results in results:
+            writer.write_rows((str(repo_path) if repo_path else '', author_result.author,
+                               author_result.commits, author_result.insertions,
+                               author_result.deletions, author_result.net)
+                              for author_result in git_results.resolve_author(args.author))
+
+
+def run_branches(args, repo_path: Path):
+    if not args.top_contributors or args.dir is not None or args.by == 'o' or \
+            args.no_merges or args.include or args.exclude:
+        Prompts.error_prompt(
+            "Error: --branches works with -top and cannot be combined with --dir, -by o, "
+            "--no-merges, --include or --exclude.")
+        sys.exit(1)
+    from branches import BranchAnalysis
+    by = args.by
+    analysis = BranchAnalysis(repo_path, args.branches, args.jobs).run()
+    if not analysis.refs:
+        Prompts.error_prompt("Error: The repository has no branches to analyze.")
+        sys.exit(1)
+
+    def scoped(git_results: GitResults) -> GitResults:
+        if args.since is None and args.until is None:
+            return git_results
+        with profiler.phase('window'):
+            return git_results.window(args.since, args.until)
+
+    def branch_scope(ref: str) -> GitResults:
+        if args.branch_scope == 'reach':
+            return analysis.branch_results(ref)
+        return analysis.unique_results(ref)
+
+    if args.format:
+        # The all-branches rows carry an empty branch field, like the
+        # organization-wide rows of --batch.
+        with profiler.phase('render'), RowWriter(args.format, contributor_fields(by, 'branch')) as writer:
+            export_contributors(writer, scoped(analysis.combined()), by, args.limit,
+                                args.offset, '')
+            for ref in analysis.refs:
+                export_contributors(writer, scoped(branch_scope(ref)), by, args.limit,
+                                    args.offset, ref)
+        return
+
+    with profiler.phase('render'):
+        display_branch_summary(analysis.summary())
+        Prompts.info_prompt(
+            f"All Branches Ranked by {by.upper()} (shared commits counted once):")
+        display_top_contributors(scoped(analysis.combined()).get_top_contributors(
+            by=by, top_n=args.limit, offset=args.offset), by)
+        for ref in analysis.refs:
+            if args.branch_scope == 'reach':
+                Prompts.info_prompt(f"{ref}: Top Contributors Ranked by {by.upper()}:")
+            else:
+                Prompts.info_prompt(f"Only on {ref}: Top Contributors Ranked by {by.upper()}:")
+            display_top_contributors(scoped(branch_scope(ref)).get_top_contributors(
+                by=by, top_n=args.limit, offset=args.offset), by)
+
+
+def run_approx(args, repo_path: Path):
+    """
+    Answers -top or -i from a sample of the history; the filters narrow the
+    commits the sample is drawn from.
+    """
+    from sampling import CommitSample
+    walk_filter = WalkFilter(args.since, args.until, no_merges=args.no_merges,
+                             include=args.include, exclude=args.exclude)
+    # -i needs only the commit list, not a numstat sample.
+    budget = args.sample if args.top_contributors else 0
+    sample = CommitSample(repo_path, budget, args.sample_mode, walk_filter).run()
+    fmt = args.format
+    if args.info:
+        git_data = GitData(repo_path, use_cache=not args.no_cache)
+        with profiler.phase('render'):
+            if fmt:
+                export_repo_info(fmt, git_data, sample)
+            else:
+                display_repo_info(git_data, sample)
+        return
+    top_contributors = sample.get_top_contributors(
+        by=args.by, top_n=args.limit, offset=args.offset)
+    with profiler.phase('render'):
+        if fmt:
+            export_estimates(fmt, top_contributors)
+            return
+        Prompts.info_prompt(f"Estimated Top Contributors Ranked by {args.by.upper()}:")
+        display_estimated_contributors(sample, top_contributors)
+
+
+def run_as_cli(args, load_git_data: Optional[Callable[..., GitData]] = None):
+    """
+    Runs one command-line query. `load_git_data` supplies the repository's
+    data, such as already loaded data kept by the daemon; by default it is
+    read from the repository.
+    """
+    validate_approx(args)
+    if args.batch or args.recursive:
+        run_batch(args)
+        return
 
-def run_as_cli(args):
     if not args.path:
         Prompts.error_prompt(
             "Error: The -p/--path argument is required in command-line mode.")
@@ -62,35 +569,161 @@ def run_as_cli(args):
     author = args.author
     top = args.top_contributors
     info = args.info
-    by = args.by  # 'i', 'd', or 'net'
+    by = args.by  # 'i', 'd', 'net' or 'c'
+    use_cache = not args.no_cache
+    jobs = args.jobs
+    windowed = args.since is not None or args.until is not None
+
+    if jobs < 1:
+        Prompts.error_prompt("Error: -j/--jobs must be at least 1.")
+        sys.exit(1)
+    validate_paging(args)
+
+    if args.path_depth is not None and args.path_depth < 0 or \
+            args.path_nodes is not None and args.path_nodes < 1:
+        Prompts.error_prompt(
+            "Error: --path-depth must not be negative and --path-nodes must be at least 1.")
+        sys.exit(1)
+    if args.dir is not None and windowed:
+        Prompts.error_prompt("Error: --dir cannot be combined with --since or --until.")
+        sys.exit(1)
+    if args.dir is not None and by == 'm':
+        Prompts.error_prompt(
+            "Error: -by m needs per-commit sizes, which --dir statistics do not keep.")
+        sys.exit(1)
+    validate_ownership(args)
 
     GitUtils.validate_git(repo_path)
 
+    if args.approx:
+        run_approx(args, repo_path)
+        return
+    if args.branches is not None:
+        run_branches(args, repo_path)
+        return
+
+    # Data kept warm by the daemon already holds every author.
+    walk_filter = build_walk_filter(args, repo_path if load_git_data is None else None)
+
+    def load() -> GitData:
+        if load_git_data is not None:
+            return load_git_data(repo_path, args, walk_filter)
+        # The path trie is only built when a directory may be asked about.
+        track_paths = args.dir is not None or args.path_depth is not None or \
+            args.path_nodes is not None
+        return GitData(repo_path, use_cache=use_cache, jobs=jobs,
+                       path_depth=args.path_depth, path_nodes=args.path_nodes,
+                       walk_filter=walk_filter, track_paths=track_paths)
+
+    fmt = args.format
     if info:
-        git_data = GitData(repo_path)
-        display_repo_info(git_data)
+        git_data = load()
+        with profiler.phase('render'):
+            if fmt:
+                export_repo_info(fmt, git_data)
+            else:
+                display_repo_info(git_data)
+    elif args.owners is not None or top and args.dir is not None:
+        git_data = load()
+        directory = args.owners if args.owners is not None else args.dir
+        ranked_by = None if args.owners is not None else by
+        if fmt:
+            path_results = git_data.git_results.path_results(directory)
+            if path_results is None:
+                sys.stderr.write(f"No statistics recorded under '{directory}'.\n")
+                sys.exit(1)
+            with profiler.phase('render'):
+                if ranked_by is None:
+                    export_owners(fmt, path_results, args.limit, args.offset)
+                else:
+                    with RowWriter(fmt, contributor_fields(by)) as writer:
+                        export_contributors(writer, path_results, by, args.limit, args.offset)
+            return
+        if ranked_by is None:
+            Prompts.info_prompt(f"Owners of {directory}:")
+        else:
+            Prompts.info_prompt(f"Top Contributors under {directory} Ranked by {by.upper()}:")
+        with profiler.phase('render'):
+            found = display_path_query(git_data.git_results, directory,
+                                       args.limit, args.offset, ranked_by)
+        if not found:
+            sys.exit(1)
     elif top:
-        git_data = GitData(repo_path)
+        git_data = load()
+        git_results = git_data.git_results
+        if by == 'o':
+            from blame import BlameEngine
+            BlameEngine(repo_path, use_cache=use_cache).apply(git_results)
+        if windowed:
+            with profiler.phase('window'):
+                git_results = git_results.window(args.since, args.until)
+        if fmt:
+            with profiler.phase('render'), RowWriter(fmt, contributor_fields(by)) as writer:
+                export_contributors(writer, git_results, by, args.limit, args.offset)
+            return
+        with profiler.phase('rank'):
+            top_contributors = git_results.get_top_contributors(
+                by=by, top_n=args.limit, offset=args.offset)
         Prompts.info_prompt(f"Top Contributors Ranked by {by.upper()}:")
-        display_top_contributors(
-            git_data.git_results.get_top_contributors(by=by), by)
+        with profiler.phase('render'):
+            display_top_contributors(top_contributors, by)
     elif author:
-        GitUtils.check_author_exists(repo_path, author)
-
-        git_data = GitData(repo_path)
-        display_author_stats(git_data.git_results.get_contribution(author))
+        git_data = load()
+        with profiler.phase('render'):
+            if fmt:
+                found = export_author_query(fmt, git_data.git_results, author,
+                                            args.since, args.until, args.bucket)
+            else:
+                git_results = git_data.git_results
+                candidates = None
+                if walk_filter is not None and walk_filter.author and \
+                        not git_results.resolve_author(author):
+                    # The walk kept only authors matching the query, so
+                    # suggestions are drawn from every author instead; one
+                    # the query already names just has no commits in scope.
+                    candidates = [name for name in GitUtils.get_history_summary(repo_path)[0]
+                                  if name.casefold() != author.casefold()]
+                found = display_author_query(git_results, author, args.since,
+                                             args.until, args.bucket, candidates)
+        if not found:
+            sys.exit(1)
     else:
         Prompts.error_prompt(
-            "No action specified. Use -a/--author, -top, or -i/--info."
+            "No action specified. Use -a/--author, -top, --owners, or -i/--info."
         )
         sys.exit(1)
 
 
+def report_profile(args):
+    if args.profile:
+        display_profile(profiler.summary())
+    if args.profile_trace:
+        profiler.write_trace(args.profile_trace)
+        Prompts.info_prompt(f"Profile trace written to {args.profile_trace}")
+    if profiler.dump_cprofile():
+        Prompts.info_prompt(f"cProfile statistics written to {args.cprofile_output}")
+
+
 def main() -> None:
     if len(sys.argv) > 1:
         args = set_app_args()
-        run_as_cli(args)
+        if args.connect or args.daemon:
+            from daemon import forward_query, serve
+        if args.connect:
+            sys.exit(forward_query(sys.argv[1:], args.socket))
+        if args.daemon:
+            serve(args.socket, args.memory_budget, args.jobs, build_parser, run_as_cli)
+            return
+        if not (args.profile or args.profile_trace or args.cprofile):
+            run_as_cli(args)
+            return
+        profiler.enable(args.cprofile, args.cprofile_output)
+        try:
+            run_as_cli(args)
+        finally:
+            report_profile(args)
     else:
+        from app import App
         app = App()
         app.start()
 
@@ -0,0 +1,232 @@
+# path_trie.py
+
+import codecs
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def resolve_path(path: bytes) -> bytes:
+    """
+    The current path of a numstat entry. Quoted paths are unescaped and
+    renames, shown as "old => new" or "dir/{old => new}/file", resolve to
+    the new name.
+    """
+    if path[:1] == b'"' and path[-1:] == b'"':
+        path = codecs.escape_decode(path[1:-1])[0]
+    arrow = path.find(b' => ')
+    if arrow < 0:
+        return path
+    start = path.rfind(b'{', 0, arrow)
+    end = path.find(b'}', arrow)
+    if start < 0 or end < 0:
+        return path[arrow + 4:]
+    # An empty side of the braces leaves a doubled slash behind.
+    return (path[:start] + path[arrow + 4:end] + path[end + 1:]).replace(b'//', b'/')
+
+
+def split_path(path: str) -> List[str]:
+    return [part for part in path.replace('\\', '/').split('/') if part not in ('', '.')]
+
+
+class PathTrie:
+    """
+    Per-author totals for every directory of the repository, filled from the
+    numstat paths while the history is walked. A change is added to each
+    directory above the file, so a node holds the totals of its whole
+    subtree and a query only reads the node it names.
+
+    Nodes live in parallel lists indexed by node id, with the root at 0 and
+    every parent created before its children. `max_depth` and `max_nodes`
+    bound memory: changes below the limits still count towards the deepest
+    directory that is tracked.
+
+    Filling the trie costs more than the rest of the parse, so results
+    that will never be asked about a directory are made with `enabled`
+    off; such a trie stays empty and makes any trie it is merged into
+    empty too, since that one could no longer be complete.
+    """
+    CHAIN_CACHE_SIZE = 65536
+
+    def __init__(self, max_depth: Optional[int] = None, max_nodes: Optional[int] = None,
+                 enabled: bool = True):
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.enabled = enabled
+        self.names: List[str] = ['']
+        self.parents: List[int] = [-1]
+        self.children: List[Dict[str, int]] = [{}]
+        self.totals: List[Dict[int, List[int]]] = [{}]
+        self.truncated = False
+        self._chains: Dict[bytes, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def options(self) -> Tuple[Optional[int], Optional[int], bool]:
+        return self.max_depth, self.max_nodes, self.enabled
+
+    def _child(self, node: int, name: str, depth: int) -> Optional[int]:
+        child = self.children[node].get(name)
+        if child is not None:
+            return child
+        if self.max_depth is not None and depth > self.max_depth:
+            return None
+        if self.max_nodes is not None and len(self.names) >= self.max_nodes:
+            self.truncated = True
+            return None
+        child = len(self.names)
+        self.names.append(name)
+        self.parents.append(node)
+        self.children.append({})
+        self.totals.append({})
+        self.children[node][name] = child
+        return child
+
+    def _chain(self, directory: bytes) -> List[int]:
+        # Node ids from the root down to the deepest tracked directory.
+        # Directories below the depth limit share the chain of the one they
+        # are counted towards, and the memo is dropped once it grows past
+        # CHAIN_CACHE_SIZE, so it stays within the limits too.
+        if self.max_depth is not None:
+            directory = b'/'.join(directory.split(b'/', self.max_depth)[:self.max_depth])
+        chain = self._chains.get(directory)
+        if chain is None:
+            chain = [0]
+            parts = split_path(directory.decode('utf-8', errors='replace'))
+            for depth, name in enumerate(parts, start=1):
+                child = self._child(chain[-1], name, depth)
+                if child is None:
+                    break
+                chain.append(child)
+            if len(self._chains) >= self.CHAIN_CACHE_SIZE:
+                self._chains.clear()
+            self._chains[directory] = chain
+        return chain
+
+    def add_files(self, paths: Iterable[bytes], author_ids: Iterable[int],
+                  insertions: Iterable[int], deletions: Iterable[int]):
+        """
+        Adds one numstat line per path. Lines are grouped by path and then
+        by directory and author first, so each directory chain is walked
+        once per block.
+        """
+        if not self.enabled:
+            return
+        grouped: Dict[Tuple[bytes, int], List[int]] = {}
+        for key, file_insertions, file_deletions in zip(
+                zip(paths, author_ids), insertions, deletions):
+            group = grouped.get(key)
+            if group is None:
+                grouped[key] = [1, file_insertions, file_deletions]
+            else:
+                group[0] += 1
+                group[1] += file_insertions
+                group[2] += file_deletions
+
+        by_directory: Dict[Tuple[bytes, int], List[int]] = {}
+        for (path, author_id), group in grouped.items():
+            if b'=>' in path or path[:1] == b'"':
+                path = resolve_path(path)
+            key = (path.rpartition(b'/')[0], author_id)
+            row = by_directory.get(key)
+            if row is None:
+                by_directory[key] = group
+            else:
+                row[0] += group[0]
+                row[1] += group[1]
+                row[2] += group[2]
+
+        totals = self.totals
+        for (directory, author_id), (files, file_insertions, file_deletions) in by_directory.items():
+            for node in self._chain(directory):
+                row = totals[node].get(author_id)
+                if row is None:
+                    totals[node][author_id] = [files, file_insertions, file_deletions]
+                else:
+                    row[0] += files
+                    row[1] += file_insertions
+                    row[2] += file_deletions
+
+    def find(self, path: str) -> Optional[int]:
+        node = 0
+        for name in split_path(path):
+            node = self.children[node].get(name)
+            if node is None:
+                return None
+        return node
+
+    def is_beyond_limits(self, path: str) -> bool:
+        """
+        Whether a directory that was not found may have been left out by the
+        depth or size limit rather than never existing.
+        """
+        if self.truncated:
+            return True
+        return self.max_depth is not None and len(split_path(path)) > self.max_depth
+
+    def disable(self):
+        self.enabled = False
+        self.names = ['']
+        self.parents = [-1]
+        self.children = [{}]
+        self.totals = [{}]
+        self.truncated = False
+        self._chains = {}
+
+    def merge(self, other: 'PathTrie', id_map: List[int]):
+        if not other.enabled:
+            self.disable()
+            return
+        if not self.enabled:
+            return
+        node_map: List[Optional[int]] = [0]
+        for other_node in range(1, len(other)):
+            parent = node_map[other.parents[other_node]]
+            node = None
+            if parent is not None:
+                node = self._child(parent, other.names[other_node],
+                                   other.depth(other_node))
+            node_map.append(node)
+        self.truncated = self.truncated or other.truncated
+        for other_node, node in enumerate(node_map):
+            if node is None:
+                continue
+            totals = self.totals[node]
+            for other_id, (files, insertions, deletions) in other.totals[other_node].items():
+                row = totals.setdefault(id_map[other_id], [0, 0, 0])
+                row[0] += files
+                row[1] += insertions
+                row[2] += deletions
+
+    def depth(self, node: int) -> int:
+        depth = 0
+        while node > 0:
+            node = self.parents[node]
+            depth += 1
+        return depth
+
+    def to_dict(self) -> dict:
+        return {
+            'limits': [self.max_depth, self.max_nodes],
+            'enabled': self.enabled,
+            'names': self.names,
+            'parents': self.parents,
+            'totals': [[value for author_id, row in node_totals.items()
+                        for value in (author_id, *row)]
+                       for node_totals in self.totals],
+            'truncated': self.truncated,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'PathTrie':
+        trie = cls(*data['limits'], enabled=data['enabled'])
+        trie.names = list(data['names'])
+        trie.parents = list(data['parents'])
+        trie.children = [{} for _ in trie.names]
+        for node in range(1, len(trie.names)):
+            trie.children[trie.parents[node]][trie.names[node]] = node
+        trie.totals = [
+            {flat[i]: flat[i + 1:i + 4] for i in range(0, len(flat), 4)}
+            for flat in data['totals']
+        ]
+        trie.truncated = data['truncated']
+        return trie
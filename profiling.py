@@ -0,0 +1,167 @@
+# profiling.py
+
+import contextlib
+import cProfile
+import json
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_DISABLED = contextlib.nullcontext()
+# Beyond this many events a long shell session keeps only the totals.
+MAX_TRACE_EVENTS = 100_000
+
+
+def peak_rss_kib(who: int) -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # macOS reports bytes, Linux kibibytes.
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+class Profiler:
+    """
+    Collects phase timings, git call statistics and counters for one run.
+    Everything is a no-op until `enable` is called: `phase` hands back a
+    shared null context and the record methods return after one attribute
+    check, so instrumented code costs next to nothing when profiling is off.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.cprofile_phase: Optional[str] = None
+        self.cprofile_path: Optional[Path] = None
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._lock = threading.Lock()
+        self.reset()
+
+    def enable(self, cprofile_phase: Optional[str] = None,
+               cprofile_path: Optional[Path] = None):
+        self.enabled = True
+        self.cprofile_phase = cprofile_phase
+        self.cprofile_path = cprofile_path
+
+    def reset(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, List[float]] = {}
+        self.git_calls: Dict[str, List[float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.events: List[dict] = []
+
+    def phase(self, name: str):
+        if not self.enabled:
+            return _DISABLED
+        return self._timed_phase(name)
+
+    @contextlib.contextmanager
+    def _timed_phase(self, name: str):
+        profile = None
+        if name == self.cprofile_phase:
+            profile = self._cprofile = self._cprofile or cProfile.Profile()
+            profile.enable()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            if profile is not None:
+                profile.disable()
+            with self._lock:
+                totals = self.phases.setdefault(name, [0, 0.0])
+                totals[0] += 1
+                totals[1] += elapsed
+                self._event(name, 'phase', started, elapsed)
+
+    def _event(self, name: str, category: str, started: float, elapsed: float, **args):
+        # Chrome trace "complete" events, in microseconds since the start.
+        if len(self.events) >= MAX_TRACE_EVENTS:
+            return
+        self.events.append({
+            'name': name, 'cat': category, 'ph': 'X', 'pid': 0,
+            'tid': threading.get_ident(),
+            'ts': round((started - self.started) * 1e6),
+            'dur': round(elapsed * 1e6),
+            'args': args,
+        })
+
+    def record_git(self, cmd: List[str], started: float, bytes_read: int,
+                   elapsed: Optional[float] = None):
+        """
+        Records one git call. `elapsed` defaults to the time since
+        `started`; streaming callers pass only the time spent waiting on git.
+        """
+        if not self.enabled:
+            return
+        if elapsed is None:
+            elapsed = time.perf_counter() - started
+        name = ' '.join(cmd[1:2]) or 'git'
+        with self._lock:
+            totals = self.git_calls.setdefault(name, [0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += elapsed
+            totals[2] += bytes_read
+            self._event(name, 'git', started, elapsed, argv=cmd, bytes=bytes_read)
+
+    def count(self, name: str, amount: int = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def note(self, name: str, value: int):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = value
+
+    def run(self, cmd: List[str], **kwargs) -> subprocess.CompletedProcess:
+        """
+        subprocess.run that records the git call when profiling is on.
+        """
+        if not self.enabled:
+            return subprocess.run(cmd, **kwargs)
+        started = time.perf_counter()
+        result = subprocess.run(cmd, **kwargs)
+        self.record_git(cmd, started, len(result.stdout or b''))
+        return result
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                'wall_seconds': time.perf_counter() - self.started,
+                'phases': {name: {'calls': calls, 'seconds': seconds}
+                           for name, (calls, seconds) in self.phases.items()},
+                'git_calls': {name: {'calls': calls, 'seconds': seconds, 'bytes': size}
+                              for name, (calls, seconds, size) in self.git_calls.items()},
+                'counters': dict(self.counters),
+                # Only this process: on Linux a child's peak also counts the
+                # parent's pages from before it execs git, so the peak of
+                # the git processes cannot be told apart.
+                'peak_rss_kib': peak_rss_kib(resource.RUSAGE_SELF) if resource else None,
+            }
+
+    def write_trace(self, path: Path):
+        with self._lock:
+            events = list(self.events)
+        path.write_text(json.dumps({
+            'traceEvents': events,
+            'summary': self.summary(),
+        }, indent=1))
+
+    def dump_cprofile(self) -> bool:
+        if self._cprofile is None or self.cprofile_path is None:
+            return False
+        self._cprofile.dump_stats(str(self.cprofile_path))
+        return True
+
+
+profiler = Profiler()
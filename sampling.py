@@ -0,0 +1,256 @@
+# sampling.py
+
+import hashlib
+import math
+import random
+import subprocess
+import sys
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from branches import split_records
+from display import Prompts
+from git import GitResults, GitUtils, NumstatParser, WalkFilter
+from profiling import profiler
+
+# Two-sided 95% quantile of the normal distribution.
+Z_95 = 1.959964
+# Stratified samples cut the history into this many equal-sized time
+# ranges, fewer when the budget cannot give each at least two commits.
+STRATA = 20
+METRICS = ('commits', 'insertions', 'deletions', 'net')
+
+
+class HyperLogLog:
+    """
+    Cardinality sketch: `2 ** precision` one-byte registers estimate the
+    number of distinct values added with a relative standard error of
+    about 1.04 / sqrt(registers), whatever the number of values. Small
+    counts fall back to linear counting and are close to exact.
+    """
+
+    def __init__(self, precision: int = 12):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value: str):
+        digest = hashlib.blake2b(value.encode('utf-8', errors='surrogateescape'),
+                                 digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        rest_bits = 64 - self.precision
+        index = hashed >> rest_bits
+        # Position of the first set bit in the remaining bits, from 1.
+        rank = rest_bits - (hashed & ((1 << rest_bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self) -> float:
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / sum(2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        if zeros and estimate <= 2.5 * size:
+            estimate = size * math.log(size / zeros)
+        return estimate
+
+    def margin(self) -> float:
+        """
+        Half-width of the 95% confidence interval of `count`.
+        """
+        return Z_95 * 1.04 / math.sqrt(len(self.registers)) * self.count()
+
+
+class AuthorEstimate:
+    """
+    Estimated totals for one author, each with the half-width of its 95%
+    confidence interval in `margins`.
+    """
+    __slots__ = ('author', 'commits', 'insertions', 'deletions', 'net', 'margins')
+
+    def __init__(self, author: str, totals: Dict[str, float], margins: Dict[str, float]):
+        self.author = author
+        self.commits = totals['commits']
+        self.insertions = totals['insertions']
+        self.deletions = totals['deletions']
+        self.net = totals['net']
+        self.margins = margins
+
+
+class CommitSample:
+    """
+    Contributor totals estimated from a random sample of the history
+    instead of the whole numstat log. One header-only `git rev-list` lists
+    every commit with its author time and feeds the author names to a
+    HyperLogLog sketch; `budget` commits are then drawn, uniformly or as
+    equal shares of equal-sized time strata, and only those are read with
+    `git log --numstat`, cut per stratum as in BranchAnalysis.
+
+    Each stratum's sampled sums are scaled by N_h / n_h and the margins
+    come from the stratified-sampling variance with the finite population
+    correction, so a budget that covers the history gives exact totals.
+    The sample is seeded from the newest commit, so the same history
+    always gives the same estimates. A budget of 0 reads the commit list
+    only.
+    """
+    HEADER_FORMAT = '%at%x1f%ad%x1f%aN'
+
+    def __init__(self, repo_path: Path, budget: int, mode: str = 'stratified',
+                 walk_filter: Optional[WalkFilter] = None):
+        self.repo_path = repo_path
+        self.budget = budget
+        self.mode = mode
+        self.walk_filter = walk_filter
+        self.authors = HyperLogLog()
+        self.oids: List[str] = []
+        self.timestamps = array('q')
+        self.first_commit_date = ''
+        self.last_commit_date = ''
+        self.sampled = 0
+        self._estimates: List[AuthorEstimate] = []
+
+    def __len__(self) -> int:
+        return len(self.oids)
+
+    def run(self) -> 'CommitSample':
+        with profiler.phase('population'):
+            self._read_population()
+        if self.budget and self.oids:
+            strata = self._draw()
+            with profiler.phase('walk'):
+                groups = self._walk(strata)
+            with profiler.phase('estimate'):
+                self._estimate(strata, groups)
+        profiler.note('population_commits', len(self.oids))
+        profiler.note('sampled_commits', self.sampled)
+        return self
+
+    def _read_population(self):
+        walk_filter = self.walk_filter
+        cmd = ['git', 'rev-list', f'--format={self.HEADER_FORMAT}', 'HEAD']
+        if walk_filter:
+            cmd[3:3] = walk_filter.log_options()
+            if walk_filter.pathspecs():
+                cmd += ['--', *walk_filter.pathspecs()]
+        try:
+            result = profiler.run(
+                cmd,
+                cwd=str(self.repo_path),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+        except FileNotFoundError:
+            Prompts.error_prompt("Git is not installed or not found in PATH.")
+            sys.exit(1)
+        if result.returncode != 0:
+            Prompts.error_prompt(
+                f"Git error: {result.stderr.decode('utf-8', errors='replace').strip()}")
+            sys.exit(1)
+
+        since = walk_filter.since if walk_filter and walk_filter.since is not None else -sys.maxsize
+        until = walk_filter.until if walk_filter and walk_filter.until is not None else sys.maxsize
+        first_time = last_time = None
+        previous_author = None
+        lines = result.stdout.split(b'\n')
+        # Each commit is a "commit <oid>" line followed by its header line.
+        for commit_line, header in zip(lines[0::2], lines[1::2]):
+            timestamp, date, author = header.split(b'\x1f', 2)
+            timestamp = int(timestamp)
+            if not since <= timestamp < until:
+                continue
+            self.oids.append(commit_line[7:].decode('ascii'))
+            self.timestamps.append(timestamp)
+            # Runs of commits by one author are common; hashing each name
+            # once per run keeps the sketch cheap.
+            if author != previous_author:
+                self.authors.add(author.decode('utf-8', errors='replace'))
+                previous_author = author
+            # Same tie-breaking as GitResults.add_commit_date.
+            if first_time is None or timestamp <= first_time:
+                first_time, self.first_commit_date = timestamp, date.decode('utf-8', 'replace')
+            if last_time is None or timestamp > last_time:
+                last_time, self.last_commit_date = timestamp, date.decode('utf-8', 'replace')
+
+    def _draw(self) -> List[Tuple[int, List[str]]]:
+        """
+        `(stratum size, sampled commits)` for each stratum, oldest first.
+        """
+        population = len(self.oids)
+        budget = min(self.budget, population)
+        count = 1 if self.mode == 'uniform' else max(1, min(STRATA, budget // 2))
+        order = sorted(range(population), key=self.timestamps.__getitem__)
+        generator = random.Random(self.oids[0])
+        strata = []
+        for stratum in range(count):
+            members = order[population * stratum // count:population * (stratum + 1) // count]
+            share = budget * (stratum + 1) // count - budget * stratum // count
+            chosen = generator.sample(members, min(share, len(members)))
+            strata.append((len(members), [self.oids[index] for index in chosen]))
+        self.sampled = sum(len(commits) for _, commits in strata)
+        return strata
+
+    def _walk(self, strata: List[Tuple[int, List[str]]]) -> List[GitResults]:
+        # The population already reflects the dates and merge filter; only
+        # the pathspecs still apply to the numstat lines.
+        walk_filter = None
+        if self.walk_filter and self.walk_filter.pathspecs():
+            walk_filter = WalkFilter(include=self.walk_filter.include,
+                                     exclude=self.walk_filter.exclude)
+        groups = [GitResults(track_paths=False) for _ in strata]
+        parsers = [NumstatParser(git_results) for git_results in groups]
+        commits = [oid for _, sampled in strata for oid in sampled]
+        chunks = GitUtils.stream_git_data(self.repo_path, commits=commits,
+                                          walk_filter=walk_filter)
+        for group, piece in split_records(chunks, [len(sampled) for _, sampled in strata]):
+            parsers[group].feed(piece)
+        for parser in parsers:
+            parser.close()
+        return groups
+
+    def _estimate(self, strata: List[Tuple[int, List[str]]], groups: List[GitResults]):
+        totals: Dict[str, Dict[str, float]] = {}
+        variances: Dict[str, Dict[str, float]] = {}
+        for (size, sampled), git_results in zip(strata, groups):
+            drawn = len(sampled)
+            series = git_results.series
+            # Per author and metric: sum and sum of squares over the sample.
+            sums: Dict[int, List[float]] = {}
+            for author_id, insertions, deletions, files in zip(
+                    series.author_ids, series.insertions, series.deletions, series.files):
+                row = sums.setdefault(author_id, [0.0] * 8)
+                for position, value in enumerate(
+                        (files, insertions, deletions, insertions - deletions)):
+                    row[position] += value
+                    row[position + 4] += value * value
+            weight = size / drawn
+            # Sample variance of each author's per-commit values, where the
+            # other authors' commits count as zeros.
+            correction = size * size * (1 - drawn / size) / drawn if drawn > 1 else 0.0
+            for author_id, row in sums.items():
+                author = git_results.author_names[author_id]
+                author_totals = totals.setdefault(author, dict.fromkeys(METRICS, 0.0))
+                author_variances = variances.setdefault(author, dict.fromkeys(METRICS, 0.0))
+                for position, metric in enumerate(METRICS):
+                    total, squares = row[position], row[position + 4]
+                    author_totals[metric] += weight * total
+                    if correction:
+                        spread = (squares - total * total / drawn) / (drawn - 1)
+                        author_variances[metric] += correction * max(spread, 0.0)
+        self._estimates = [
+            AuthorEstimate(author, author_totals,
+                           {metric: Z_95 * math.sqrt(variances[author][metric])
+                            for metric in METRICS})
+            for author, author_totals in totals.items()]
+
+    def distinct_authors(self) -> Tuple[float, float]:
+        """
+        Estimated number of distinct author names and its 95% margin.
+        """
+        return self.authors.count(), self.authors.margin()
+
+    def get_top_contributors(self, by: str = 'net', top_n: Optional[int] = 10,
+                             offset: int = 0) -> List[Tuple[int, AuthorEstimate]]:
+        metric = GitResults.RANK_METRICS.get(by, 'net')
+        ranking = sorted(self._estimates, key=lambda estimate: getattr(estimate, metric),
+                         reverse=True)
+        end = None if top_n is None else offset + top_n
+        return list(enumerate(ranking[offset:end], start=offset + 1))
@@ -0,0 +1,120 @@
+# series.py
+
+import base64
+import re
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+_RELATIVE_DATE = re.compile(r'^(\d+)([dwmy])$')
+_RELATIVE_DAYS = {'d': 1, 'w': 7, 'm': 30, 'y': 365}
+
+BUCKET_PERIODS = ('week', 'month')
+
+
+def parse_date(value: str) -> int:
+    """
+    Parses a window bound given as an ISO date/time (local time, like git)
+    or as a relative age such as 90d, 12w, 6m or 1y. Raises ValueError.
+    """
+    match = _RELATIVE_DATE.match(value.strip().lower())
+    if match:
+        days = int(match.group(1)) * _RELATIVE_DAYS[match.group(2)]
+        return int((datetime.now() - timedelta(days=days)).timestamp())
+    return int(datetime.fromisoformat(value.strip()).timestamp())
+
+
+def bucket_label(timestamp: int, period: str) -> str:
+    moment = datetime.fromtimestamp(timestamp)
+    if period == 'week':
+        return moment.strftime('%G-W%V')
+    return moment.strftime('%Y-%m')
+
+
+def _encode(column: array) -> str:
+    return base64.b64encode(column.tobytes()).decode('ascii')
+
+
+def _decode(typecode: str, data: str) -> array:
+    column = array(typecode)
+    column.frombytes(base64.b64decode(data))
+    return column
+
+
+class CommitSeries:
+    """
+    One row per commit, held in parallel typed arrays in the order the
+    commits were read. Window queries bisect a timestamp-sorted permutation
+    of the rows that is built on first use and dropped when rows are added.
+    """
+    COLUMNS = {
+        'timestamps': 'q',
+        'author_ids': 'l',
+        'insertions': 'q',
+        'deletions': 'q',
+        'files': 'l',
+    }
+
+    def __init__(self):
+        self.timestamps = array('q')
+        self.author_ids = array('l')
+        self.insertions = array('q')
+        self.deletions = array('q')
+        self.files = array('l')
+        self._order: Optional[List[int]] = None
+        self._sorted_timestamps: Optional[List[int]] = None
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def add_commit(self, timestamp: int, author_id: int, insertions: int = 0,
+                   deletions: int = 0, files: int = 0):
+        self.timestamps.append(timestamp)
+        self.author_ids.append(author_id)
+        self.insertions.append(insertions)
+        self.deletions.append(deletions)
+        self.files.append(files)
+        self._order = None
+
+    def extend_columns(self, timestamps: array, author_ids: array, insertions: array,
+                       deletions: array, files: array):
+        self.timestamps.extend(timestamps)
+        self.author_ids.extend(author_ids)
+        self.insertions.extend(insertions)
+        self.deletions.extend(deletions)
+        self.files.extend(files)
+        self._order = None
+
+    def extend(self, other: 'CommitSeries', id_map: List[int]):
+        self.timestamps.extend(other.timestamps)
+        self.author_ids.extend(id_map[author_id] for author_id in other.author_ids)
+        self.insertions.extend(other.insertions)
+        self.deletions.extend(other.deletions)
+        self.files.extend(other.files)
+        self._order = None
+
+    def rows_between(self, since: Optional[int] = None,
+                     until: Optional[int] = None) -> List[int]:
+        """
+        Row numbers with since <= timestamp < until, in the order the rows
+        were read.
+        """
+        if since is None and until is None:
+            return list(range(len(self)))
+        if self._order is None:
+            self._order = sorted(range(len(self)), key=self.timestamps.__getitem__)
+            self._sorted_timestamps = [self.timestamps[row] for row in self._order]
+        start = 0 if since is None else bisect_left(self._sorted_timestamps, since)
+        end = len(self) if until is None else bisect_left(self._sorted_timestamps, until)
+        return sorted(self._order[start:end])
+
+    def to_dict(self) -> dict:
+        return {name: _encode(getattr(self, name)) for name in self.COLUMNS}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'CommitSeries':
+        series = cls()
+        for name, typecode in cls.COLUMNS.items():
+            setattr(series, name, _decode(typecode, data[name]))
+        return series
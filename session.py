@@ -0,0 +1,198 @@
+# session.py
+
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, IO, Iterator, List, Optional, Tuple
+from profiling import profiler
+
+
+class GitSession:
+    """
+    Long-lived `git cat-file` helpers for one repository. Object, ref and
+    tree lookups are written to a running `--batch-check` or `--batch`
+    process instead of starting git for each of them, so once a session is
+    open a lookup costs a pipe round trip.
+
+    Sessions are shared per repository for the life of the process; use
+    `for_repo` to get one and `release` when a repository is no longer
+    needed. Raises FileNotFoundError when git is not installed.
+    """
+    _sessions: Dict[Path, 'GitSession'] = {}
+    _sessions_lock = threading.Lock()
+    # Replies are about 60 bytes, well inside a 64 KiB pipe buffer.
+    PIPELINE_BATCH = 512
+    # Parsed trees kept per session; a language pass over an unchanged
+    # tree reads every directory once, so this covers large monorepos.
+    TREE_CACHE_SIZE = 16384
+
+    def __init__(self, repo_path: Path):
+        self.repo_path = repo_path
+        self._lock = threading.Lock()
+        self._check: Optional[subprocess.Popen] = None
+        self._batch: Optional[subprocess.Popen] = None
+        # Trees are immutable, so their parsed entries never go stale; the
+        # least recently read are dropped to bound memory.
+        self._trees: 'OrderedDict[str, List[Tuple[str, str, str]]]' = OrderedDict()
+
+    @classmethod
+    def for_repo(cls, repo_path: Path) -> 'GitSession':
+        with cls._sessions_lock:
+            session = cls._sessions.get(repo_path)
+            if session is None:
+                session = cls._sessions[repo_path] = cls(repo_path)
+            return session
+
+    @classmethod
+    def release(cls, repo_path: Path):
+        with cls._sessions_lock:
+            session = cls._sessions.pop(repo_path, None)
+        if session is not None:
+            session.close()
+
+    def _start(self, mode: str) -> subprocess.Popen:
+        return subprocess.Popen(
+            ['git', 'cat-file', mode],
+            cwd=str(self.repo_path),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+
+    @staticmethod
+    def _ask(process: subprocess.Popen, name: str) -> Optional[Tuple[str, str, int]]:
+        started = time.perf_counter()
+        process.stdin.write(name.encode('utf-8') + b'\n')
+        process.stdin.flush()
+        # "<oid> <type> <size>", or "<name> missing" / "<name> ambiguous".
+        header = process.stdout.readline()
+        profiler.record_git(process.args, started, len(header))
+        fields = header.split()
+        if len(fields) != 3:
+            if not fields:
+                raise OSError("git cat-file exited unexpectedly")
+            return None
+        return fields[0].decode('ascii'), fields[1].decode('ascii'), int(fields[2])
+
+    def resolve(self, name: str) -> Optional[Tuple[str, str]]:
+        """
+        `(object id, type)` for a revision expression such as HEAD,
+        "main^{tree}" or "HEAD:src", or None when it names no object.
+        """
+        if '\n' in name:
+            return None
+        with self._lock:
+            if self._check is None:
+                self._check = self._start('--batch-check')
+            found = self._ask(self._check, name)
+        return found[:2] if found else None
+
+    def object_sizes(self, oids: List[str]) -> List[Optional[int]]:
+        """
+        Sizes of many objects, written to `--batch-check` in pipelined
+        batches small enough that its replies always fit in the pipe.
+        """
+        sizes: List[Optional[int]] = []
+        with self._lock:
+            if self._check is None:
+                self._check = self._start('--batch-check')
+            process = self._check
+            for start in range(0, len(oids), self.PIPELINE_BATCH):
+                batch = oids[start:start + self.PIPELINE_BATCH]
+                started = time.perf_counter()
+                process.stdin.write(''.join(f"{oid}\n" for oid in batch).encode('ascii'))
+                process.stdin.flush()
+                bytes_read = 0
+                for _ in batch:
+                    header = process.stdout.readline()
+                    if not header:
+                        raise OSError("git cat-file exited unexpectedly")
+                    bytes_read += len(header)
+                    fields = header.split()
+                    sizes.append(int(fields[2]) if len(fields) == 3 else None)
+                profiler.record_git(process.args, started, bytes_read)
+        return sizes
+
+    def read_object(self, name: str) -> Optional[Tuple[str, bytes]]:
+        if '\n' in name:
+            return None
+        with self._lock:
+            if self._batch is None:
+                self._batch = self._start('--batch')
+            found = self._ask(self._batch, name)
+            if found is None:
+                return None
+            _, object_type, size = found
+            data = self._read_exactly(self._batch.stdout, size + 1)[:-1]
+        return object_type, data
+
+    @staticmethod
+    def _read_exactly(stream: IO[bytes], size: int) -> bytes:
+        parts = []
+        while size:
+            part = stream.read(size)
+            if not part:
+                raise OSError("git cat-file exited unexpectedly")
+            parts.append(part)
+            size -= len(part)
+        return b''.join(parts)
+
+    def read_tree(self, tree_oid: str) -> List[Tuple[str, str, str]]:
+        """
+        `(mode, object id, name)` for each entry of one tree object.
+        """
+        with self._lock:
+            entries = self._trees.get(tree_oid)
+            if entries is not None:
+                self._trees.move_to_end(tree_oid)
+        if entries is not None:
+            return entries
+        found = self.read_object(tree_oid)
+        entries = []
+        if found is not None and found[0] == 'tree':
+            data = found[1]
+            oid_size = len(tree_oid) // 2
+            position = 0
+            while position < len(data):
+                space = data.index(b' ', position)
+                nul = data.index(b'\0', space)
+                end = nul + 1 + oid_size
+                entries.append((
+                    data[position:space].decode('ascii'),
+                    data[nul + 1:end].hex(),
+                    data[space + 1:nul].decode('utf-8', errors='surrogateescape'),
+                ))
+                position = end
+        with self._lock:
+            self._trees[tree_oid] = entries
+            if len(self._trees) > self.TREE_CACHE_SIZE:
+                self._trees.popitem(last=False)
+        return entries
+
+    def walk_tree(self, tree_oid: str, prefix: str = '') -> Iterator[Tuple[str, str, str]]:
+        """
+        `(mode, object id, path)` for every file below a tree, like
+        `git ls-tree -r`. Submodule entries are not descended into.
+        """
+        for mode, oid, name in self.read_tree(tree_oid):
+            path = f"{prefix}{name}"
+            if mode == '40000':
+                yield from self.walk_tree(oid, f"{path}/")
+            elif mode != '160000':
+                yield mode, oid, path
+
+    def close(self):
+        with self._lock:
+            for process in (self._check, self._batch):
+                if process is None:
+                    continue
+                try:
+                    process.stdin.close()
+                except BrokenPipeError:
+                    # The process already exited, as it does in a broken
+                    # repository.
+                    pass
+                process.wait()
+            self._check = self._batch = None
@@ -0,0 +1,121 @@
+# sketch.py
+
+from typing import List
+
+# Items kept by the top level; lower levels keep geometrically fewer, down
+# to MIN_CAPACITY, so a sketch holds at most about three times this many
+# values plus a few per level.
+DEFAULT_K = 200
+MIN_CAPACITY = 8
+
+
+class QuantileSketch:
+    """
+    KLL quantile sketch of integers. Values are kept in levels, where an
+    item on level h stands for 2 ** h values. When a level outgrows its
+    capacity it is sorted and every other item moves up one level, so
+    memory stays bounded; with the default k a quantile is within about
+    1.5% of the count of its true rank, and fewer than k values are kept
+    exactly. Compaction alternates between keeping the odd and the even
+    items instead of flipping a coin, so the same values in the same order
+    always give the same sketch. Sketches of separate streams merge into a
+    sketch of both.
+    """
+    __slots__ = ('k', 'levels', 'count', 'max', '_flip')
+
+    def __init__(self, k: int = DEFAULT_K):
+        self.k = k
+        self.levels: List[List[int]] = [[]]
+        self.count = 0
+        self.max = 0
+        self._flip = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _capacity(self, level: int) -> int:
+        return max(MIN_CAPACITY, int(self.k * (2 / 3) ** (len(self.levels) - level - 1)))
+
+    def add(self, value: int):
+        self.levels[0].append(value)
+        self.count += 1
+        if value > self.max:
+            self.max = value
+        if len(self.levels[0]) >= self._capacity(0):
+            self._compress()
+
+    def extend(self, values: List[int]):
+        """
+        Adds many values at once, a slice filling the bottom level at a
+        time, so the result is the same as adding them one by one however
+        the stream was cut into batches.
+        """
+        if not values:
+            return
+        self.count += len(values)
+        self.max = max(self.max, max(values))
+        start = 0
+        while start < len(values):
+            end = start + self._capacity(0) - len(self.levels[0])
+            self.levels[0].extend(values[start:end])
+            start = end
+            if len(self.levels[0]) >= self._capacity(0):
+                self._compress()
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) < self._capacity(level):
+                level += 1
+                continue
+            if level + 1 == len(self.levels):
+                self.levels.append([])
+            items.sort()
+            # An odd item out stays behind so every promoted item stands
+            # for exactly two.
+            kept = [items.pop()] if len(items) % 2 else []
+            self.levels[level + 1].extend(items[self._flip::2])
+            self._flip ^= 1
+            self.levels[level] = kept
+            level += 1
+
+    def merge(self, other: 'QuantileSketch'):
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.count += other.count
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    def quantile(self, fraction: float) -> int:
+        """
+        The value at the given fraction of the sorted values; 0 when the
+        sketch is empty.
+        """
+        if not self.count:
+            return 0
+        weighted = sorted((value, 1 << level)
+                          for level, items in enumerate(self.levels) for value in items)
+        target = fraction * self.count
+        seen = 0
+        for value, weight in weighted:
+            seen += weight
+            if seen >= target:
+                return value
+        return weighted[-1][0]
+
+    def size(self) -> int:
+        return sum(map(len, self.levels))
+
+    def to_dict(self) -> dict:
+        return {'levels': self.levels, 'count': self.count, 'max': self.max}
+
+    @classmethod
+    def from_dict(cls, data: dict, k: int = DEFAULT_K) -> 'QuantileSketch':
+        sketch = cls(k)
+        sketch.levels = [list(items) for items in data['levels']]
+        sketch.count = data['count']
+        sketch.max = data['max']
+        return sketch